@@ -3,12 +3,24 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 import streamlit as st
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from utils.sheets_connector import fetch_raw_daily, fetch_raw_agent_daily, fetch_agent_list, fetch_account_data
-from utils.data_processor import get_daily_summary, get_agent_rankings, get_account_summary
-from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES
+from utils import perf
+from utils.lazy import px
+from utils.sheets_connector import (
+    fetch_datasets, clear_dataset_cache,
+)
+from utils.data_processor import (
+    filter_by_date, get_daily_summary, get_agent_rankings, get_account_summary, get_rank_history, get_rank_summary,
+)
+from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES, CHART_POINT_BUDGET
+from utils.charts import line_trace, apply_detail, detail_controls, rank_bump
+from utils.tables import render_table
+from utils.figure_cache import cached_figure, figure_cache_stats
+from utils.fragments import depends_on, section
+from utils.memory_budget import get_memory_budget
+from utils.teams import select_team
+from utils.exports import download_buttons
 
 st.set_page_config(
     page_title="Booster Dashboard",
@@ -16,6 +28,8 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
+perf.start_run("app")
+team = select_team()
 
 # --- Custom CSS ---
 st.markdown("""
@@ -61,10 +75,9 @@ st.caption(f"Last refreshed: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
 
 # --- Load Data ---
 with st.spinner("Loading data from Google Sheets..."):
-    df_daily = fetch_raw_daily()
-    df_agent_daily = fetch_raw_agent_daily()
-    agents = fetch_agent_list()
-    df_accounts = fetch_account_data()
+    df_daily, df_agent_daily, agents, df_accounts = fetch_datasets(
+        "raw_daily", "raw_agent_daily", "agent_list", "account_data",
+    )
 
 if df_daily.empty:
     st.error("No engagement data found. Check your Google Sheet connection.")
@@ -82,13 +95,31 @@ end_date = col_s2.date_input("End Date", max_date, min_value=min_date, max_value
 agent_filter = st.sidebar.selectbox("Agent", ["All Agents"] + agents)
 
 if st.sidebar.button("Refresh Data"):
-    st.cache_data.clear()
+    clear_dataset_cache()
     st.rerun()
 
+with st.sidebar.expander("Cache"):
+    fig_stats = figure_cache_stats()
+    mem = get_memory_budget().partition(team).stats()
+    st.caption(
+        f"Charts: hit rate {fig_stats['hit_rate']}% ({fig_stats['hits']:,} hits / {fig_stats['misses']:,} misses), "
+        f"{fig_stats['entries']}/{fig_stats['max_entries']} entries, {fig_stats['evictions']:,} evicted"
+    )
+    st.caption(
+        f"Memory: {mem['used'] / 2**20:,.1f} of {mem['budget'] / 2**20:,.0f} MB ({mem['used_pct']}%), "
+        + ", ".join(f"{cache} {size / 2**20:,.1f} MB" for cache, size in sorted(mem["by_cache"].items()))
+        + f"; {sum(mem['evictions'].values()):,} evicted"
+    )
+
 # --- KPI Section ---
-filtered_daily, summary = get_daily_summary(df_daily, start_date, end_date)
-rankings = get_agent_rankings(df_agent_daily, start_date, end_date)
-acct_summary = get_account_summary(df_accounts)
+period = (start_date, end_date)
+filtered_daily, summary = depends_on(
+    "app_summary", period, lambda: get_daily_summary(df_daily, start_date, end_date), ["raw_daily"],
+)
+rankings = depends_on(
+    "app_rankings", period, lambda: get_agent_rankings(df_agent_daily, start_date, end_date), ["raw_agent_daily"],
+)
+acct_summary = depends_on("app_accounts", (), lambda: get_account_summary(df_accounts), ["account_data"])
 
 st.markdown("### Key Metrics")
 c1, c2, c3, c4, c5 = st.columns(5)
@@ -110,28 +141,28 @@ if acct_summary:
     st.divider()
 
 # --- Charts Row ---
-col_left, col_right = st.columns([2, 1])
+@section("trend")
+def trend_section(filtered_daily, start_date, end_date):
+    resolution, window = detail_controls("app_trend", filtered_daily["Date"])
+    trend_data = apply_detail(filtered_daily, resolution, window, ENGAGEMENT_TYPES + ["Total"])
+    budget = None if resolution == "Daily" else CHART_POINT_BUDGET
 
-with col_left:
-    st.markdown("### Daily Engagement Trend")
-    if not filtered_daily.empty:
+    def build_trend():
         fig_trend = go.Figure()
         for metric in ENGAGEMENT_TYPES:
-            fig_trend.add_trace(go.Scatter(
-                x=filtered_daily["Date"],
-                y=filtered_daily[metric],
+            fig_trend.add_trace(line_trace(
+                trend_data["Date"], trend_data[metric],
                 name=metric,
-                mode="lines+markers",
                 line=dict(color=METRIC_COLORS[metric], width=2),
                 marker=dict(size=6),
+                budget=budget,
             ))
-        fig_trend.add_trace(go.Scatter(
-            x=filtered_daily["Date"],
-            y=filtered_daily["Total"],
+        fig_trend.add_trace(line_trace(
+            trend_data["Date"], trend_data["Total"],
             name="Total",
-            mode="lines+markers",
             line=dict(color=METRIC_COLORS["Total"], width=3, dash="dash"),
             marker=dict(size=8),
+            budget=budget,
         ))
         fig_trend.update_layout(
             template="plotly_dark",
@@ -140,7 +171,18 @@ with col_left:
             legend=dict(orientation="h", yanchor="bottom", y=1.02),
             hovermode="x unified",
         )
-        st.plotly_chart(fig_trend, use_container_width=True)
+        return fig_trend
+
+    fig_trend = cached_figure("app", "daily_trend", (start_date, end_date, resolution, window), build_trend, ["raw_daily"])
+    st.plotly_chart(fig_trend, use_container_width=True)
+
+
+col_left, col_right = st.columns([2, 1])
+
+with col_left:
+    st.markdown("### Daily Engagement Trend")
+    if not filtered_daily.empty:
+        trend_section(filtered_daily, start_date, end_date)
 
 with col_right:
     st.markdown("### Engagement Mix")
@@ -148,20 +190,24 @@ with col_right:
         "Type": ENGAGEMENT_TYPES,
         "Value": [summary.get(k.lower(), 0) for k in ENGAGEMENT_TYPES],
     }
-    fig_mix = px.donut = px.pie(
-        mix_data, values="Value", names="Type",
-        hole=0.5,
-        color="Type",
-        color_discrete_map=METRIC_COLORS,
-    )
-    fig_mix.update_layout(
-        template="plotly_dark",
-        height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-    )
-    fig_mix.update_traces(textposition="inside", textinfo="value+percent+label")
+    def build_mix():
+        fig_mix = px.donut = px.pie(
+            mix_data, values="Value", names="Type",
+            hole=0.5,
+            color="Type",
+            color_discrete_map=METRIC_COLORS,
+        )
+        fig_mix.update_layout(
+            template="plotly_dark",
+            height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            showlegend=True,
+            legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+        )
+        fig_mix.update_traces(textposition="inside", textinfo="value+percent+label")
+        return fig_mix
+
+    fig_mix = cached_figure("app", "engagement_mix", (start_date, end_date), build_mix, ["raw_daily"])
     st.plotly_chart(fig_mix, use_container_width=True)
 
 # --- Top Performers ---
@@ -170,30 +216,62 @@ if not rankings.empty:
     col_rank, col_bar = st.columns([1, 1])
 
     with col_rank:
-        display_df = rankings[["Agent", "Total", "Comments", "Reactions", "Shares", "% Contribution", "Avg/Day"]].copy()
-        display_df["% Contribution"] = display_df["% Contribution"].apply(lambda x: f"{x}%")
-        display_df["Total"] = display_df["Total"].apply(lambda x: f"{x:,}")
-        display_df["Comments"] = display_df["Comments"].apply(lambda x: f"{x:,}")
-        display_df["Reactions"] = display_df["Reactions"].apply(lambda x: f"{x:,}")
-        display_df["Shares"] = display_df["Shares"].apply(lambda x: f"{x:,}")
-        display_df["Avg/Day"] = display_df["Avg/Day"].apply(lambda x: f"{x:,}")
-        st.dataframe(display_df, use_container_width=True, height=350)
+        display_df = rankings[["Agent", "Total", "Comments", "Reactions", "Shares", "% Contribution", "Avg/Day"]]
+        render_table(display_df, height=350)
+        download_buttons("Rankings", display_df.reset_index(), f"rankings_{start_date}_{end_date}", "app_rankings")
+        download_buttons(
+            "Agent rows", df_agent_daily, f"agent_daily_{start_date}_{end_date}", "app_rows",
+            start_date=start_date, end_date=end_date,
+        )
 
     with col_bar:
-        fig_bar = px.bar(
-            rankings.reset_index(),
-            x="Agent", y=ENGAGEMENT_TYPES,
-            barmode="stack",
-            color_discrete_map=METRIC_COLORS,
-        )
-        fig_bar.update_traces(texttemplate="%{value:,}", textposition="inside")
-        fig_bar.update_layout(
-            template="plotly_dark",
-            height=350,
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02),
-            xaxis_title="",
-            yaxis_title="Engagement",
-            uniformtext_minsize=8, uniformtext_mode="hide",
-        )
+        def build_bar():
+            fig_bar = px.bar(
+                rankings.reset_index(),
+                x="Agent", y=ENGAGEMENT_TYPES,
+                barmode="stack",
+                color_discrete_map=METRIC_COLORS,
+            )
+            fig_bar.update_traces(texttemplate="%{value:,}", textposition="inside")
+            fig_bar.update_layout(
+                template="plotly_dark",
+                height=350,
+                margin=dict(l=20, r=20, t=30, b=20),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                xaxis_title="",
+                yaxis_title="Engagement",
+                uniformtext_minsize=8, uniformtext_mode="hide",
+            )
+            return fig_bar
+
+        fig_bar = cached_figure("app", "agent_rankings", (start_date, end_date), build_bar, ["raw_agent_daily"])
         st.plotly_chart(fig_bar, use_container_width=True)
+
+
+# --- Rank Movement ---
+@section("rank_movement")
+def rank_movement_section(start_date, end_date):
+    kind = st.radio("Period", ["week", "month"], format_func=str.title, horizontal=True, key="app_rank_period")
+    period = (start_date, end_date, kind)
+    history = depends_on(
+        "rank_history", period,
+        lambda: get_rank_history(filter_by_date(df_agent_daily, start_date, end_date), kind), ["raw_agent_daily"],
+    )
+    if history.empty:
+        st.info("No ranked periods in the selected range.")
+        return
+    summary = depends_on("rank_summary", period, lambda: get_rank_summary(history), ["raw_agent_daily"])
+    col_bump, col_summary = st.columns([2, 1])
+    with col_bump:
+        fig = cached_figure("app", "rank_bump", period, lambda: rank_bump(history), ["raw_agent_daily"])
+        st.plotly_chart(fig, use_container_width=True)
+    with col_summary:
+        render_table(summary[["Latest Rank", "Best Rank", "Worst Rank", "Volatility"]].sort_values("Latest Rank"), height=400)
+
+
+if not rankings.empty:
+    st.divider()
+    st.markdown("### Rank Movement")
+    rank_movement_section(start_date, end_date)
+
+perf.finish_run()
@@ -20,8 +20,109 @@ SERVICE_ACCOUNT_FILE = get_service_account_file()
 ENGAGEMENT_SHEET_ID = "1Mzm8sbn7C2qpfNunNdAwnA1rutDaHzWCHVz7mjdXPGA"
 ACCOUNTS_SHEET_ID = "13L7-Z_GDxXvP0SFNCQXzcN7DzW8zc65ABRcEc1jL2bs"
 
+# Push invalidation: POST /invalidate on the sidecar with this bearer token (disabled when unset).
+# Edited tabs are reloaded INVALIDATE_DEBOUNCE_SECONDS after the first edit of a burst.
+INVALIDATE_TOKEN = os.environ.get("INVALIDATE_TOKEN", "")
+INVALIDATE_DEBOUNCE_SECONDS = float(os.environ.get("INVALIDATE_DEBOUNCE_SECONDS", "3"))
+
+# Seconds a loaded dataset is served before it is fetched again; with push
+# invalidation this is only a safety net for missed edits
+CACHE_TTL = int(os.environ.get("CACHE_TTL", "3600" if INVALIDATE_TOKEN else "300"))
+
+# Before reloading an expired dataset, check a cheap change token (Drive modifiedTime, or a
+# hash of column A plus the last PROBE_ROWS rows) and keep the loaded frame if it is unchanged;
+# a full reload still happens at least every PROBE_MAX_AGE seconds
+CHANGE_PROBES = os.environ.get("CHANGE_PROBES", "1") == "1"
+PROBE_ROWS = 50
+PROBE_MAX_AGE = int(os.environ.get("PROBE_MAX_AGE", str(6 * 3600)))
+
+# Shared Arrow snapshot written by `python -m utils.snapshot` (disabled when unset)
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "")
+SNAPSHOT_REFRESH_SECONDS = int(os.environ.get("SNAPSHOT_REFRESH_SECONDS", "300"))
+SNAPSHOT_POLL_SECONDS = int(os.environ.get("SNAPSHOT_POLL_SECONDS", "15"))
+SNAPSHOT_KEEP = 3
+
+# Serialized Plotly figures kept across reruns (least recently used evicted first)
+FIGURE_CACHE_MAX_ENTRIES = int(os.environ.get("FIGURE_CACHE_MAX_ENTRIES", "256"))
+
+# Total memory the dataset store, figure cache and section memo may hold; past it the
+# entries with the lowest rebuild cost per byte, least recently used first, are evicted
+CACHE_MEMORY_BUDGET_MB = int(os.environ.get("CACHE_MEMORY_BUDGET_MB", "512"))
+
+# Rows encoded per step by the CSV/Parquet download buttons
+EXPORT_CHUNK_ROWS = 50_000
+
+# Per-rerun stage timings: JSON log lines on stdout (PERF_LOG=1), and the sidebar panel (or ?debug=1)
+PERF_LOG = os.environ.get("PERF_LOG", "0") == "1"
+PERF_DEBUG = os.environ.get("PERF_DEBUG", "0") == "1"
+
+# Sidecar HTTP server for http://<host>:METRICS_PORT/metrics and /invalidate; off unless set
+# (9464 is the usual Prometheus exporter port). It listens on all interfaces, unauthenticated
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Build raw_daily/raw_monthly from the agent tab instead of downloading _RawDaily/_RawMonthly.
+# Opt-in: enable once `python -m utils.derived` reports no drift for the deployment's sheets
+DERIVED_TOTALS = os.environ.get("DERIVED_TOTALS", "0") == "1"
+
+# Query backend: "pandas" keeps every dataset in memory; "sqlite" keeps SQL_DATASETS in an
+# embedded SQLite file (SQL_DB_PATH, or a per-process temp file) and pushes filters into SQL
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "pandas")
+SQL_DATASETS = ["task_daily"]
+SQL_DB_PATH = os.environ.get("SQL_DB_PATH", "")
+
+# Materialized weekly/monthly aggregates written by `python -m utils.aggregates` (disabled when unset)
+AGGREGATES_DB = os.environ.get("AGGREGATES_DB", "")
+AGGREGATES_REFRESH_SECONDS = int(os.environ.get("AGGREGATES_REFRESH_SECONDS", "300"))
+AGGREGATES_MAX_AGE = int(os.environ.get("AGGREGATES_MAX_AGE", "3600"))
+
+# cProfile + tracemalloc dumps of whole runs (PROFILE=1 for every run, or ?profile=1 for one)
+PROFILE_ALWAYS = os.environ.get("PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+
+# Rolling agent statistics: trailing windows offered, and |z| at which a day is flagged
+ROLLING_WINDOWS = [7, 28]
+ALERT_Z_THRESHOLD = 2.0
+
+# Trend charts: points per series before downsampling, and size at which traces switch to WebGL
+CHART_POINT_BUDGET = 800
+CHART_WEBGL_THRESHOLD = 400
+
 ENGAGEMENT_TYPES = ["Comments", "Reactions", "Shares"]
 EXCLUDED_AGENTS = ["Alecs", "Moja", "Valerie"]
+
+# Teams served by one deployment, as a JSON object in TEAMS keyed by team id:
+#   {"ops": {"name": "Ops", "engagement_sheet_id": "...", "accounts_sheet_id": "...",
+#            "excluded_agents": ["..."], "memory_mb": 128}, ...}
+# Unset, the single team configured above is served. Each team has its own datasets and
+# caches; memory_mb (default TEAM_MEMORY_MB, 0 = none) caps its share of CACHE_MEMORY_BUDGET_MB
+TEAM_MEMORY_MB = int(os.environ.get("TEAM_MEMORY_MB", "0"))
+
+
+def _load_teams():
+    raw = os.environ.get("TEAMS", "")
+    if not raw:
+        return {"default": {
+            "name": "Booster",
+            "engagement_sheet_id": ENGAGEMENT_SHEET_ID,
+            "accounts_sheet_id": ACCOUNTS_SHEET_ID,
+            "excluded_agents": EXCLUDED_AGENTS,
+            "memory_mb": TEAM_MEMORY_MB,
+        }}
+    return {
+        team: {
+            "name": config.get("name", team),
+            "engagement_sheet_id": config["engagement_sheet_id"],
+            "accounts_sheet_id": config["accounts_sheet_id"],
+            "excluded_agents": list(config.get("excluded_agents", [])),
+            "memory_mb": int(config.get("memory_mb", TEAM_MEMORY_MB)),
+        }
+        for team, config in json.loads(raw).items()
+    }
+
+
+TEAMS = _load_teams()
+DEFAULT_TEAM = next(iter(TEAMS))
 METRIC_COLORS = {
     "Comments": "#636EFA",
     "Reactions": "#EF553B",
@@ -2,14 +2,23 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import plotly.graph_objects as go
+from utils import perf
+from utils.lazy import px
 from utils.sheets_connector import fetch_raw_daily, fetch_raw_agent_daily
-from utils.data_processor import get_day_comparison, filter_by_date
-from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES
+from utils.data_processor import get_day_comparison, filter_by_date, status_labels
+from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES, ROLLING_WINDOWS, ALERT_Z_THRESHOLD
+from utils.charts import apply_detail, auto_resolution, detail_controls
+from utils.tables import render_table
+from utils.figure_cache import cached_figure
+from utils.fragments import section
+from utils.rolling import get_rolling_stats, get_deviation_alerts
+from utils.teams import select_team
 
 st.set_page_config(page_title="Daily Report", page_icon="📅", layout="wide")
+perf.start_run("daily")
+select_team()
 
 st.markdown("""
 <style>
@@ -65,30 +74,30 @@ if not day_agents.empty:
     with col_table:
         avg_total = df_daily["Total"].mean()
         display = day_agents[["Agent", "Comments", "Reactions", "Shares", "Total"]].copy()
-        display["% of Day"] = (display["Total"] / display["Total"].sum() * 100).round(1).astype(str) + "%"
-
-        def status_icon(total):
-            return "Above Avg" if total >= avg_total / day_agents.shape[0] else "Below Avg"
-
-        display["Status"] = display["Total"].apply(status_icon)
-        st.dataframe(display.reset_index(drop=True), use_container_width=True, height=350)
+        display["% of Day"] = (display["Total"] / display["Total"].sum() * 100).round(1)
+        display["Status"] = status_labels(display["Total"], avg_total / day_agents.shape[0])
+        render_table(display.reset_index(drop=True), height=350)
 
     with col_chart:
-        fig = px.bar(
-            day_agents,
-            x="Agent", y=ENGAGEMENT_TYPES,
-            barmode="stack",
-            color_discrete_map=METRIC_COLORS,
-        )
-        fig.update_traces(texttemplate="%{value:,}", textposition="inside")
-        fig.update_layout(
-            template="plotly_dark",
-            height=350,
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02),
-            xaxis_title="", yaxis_title="Engagement",
-            uniformtext_minsize=8, uniformtext_mode="hide",
-        )
+        def build_agent_breakdown():
+            fig = px.bar(
+                day_agents,
+                x="Agent", y=ENGAGEMENT_TYPES,
+                barmode="stack",
+                color_discrete_map=METRIC_COLORS,
+            )
+            fig.update_traces(texttemplate="%{value:,}", textposition="inside")
+            fig.update_layout(
+                template="plotly_dark",
+                height=350,
+                margin=dict(l=20, r=20, t=30, b=20),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                xaxis_title="", yaxis_title="Engagement",
+                uniformtext_minsize=8, uniformtext_mode="hide",
+            )
+            return fig
+
+        fig = cached_figure("daily", "agent_breakdown", selected_date, build_agent_breakdown, ["raw_agent_daily"])
         st.plotly_chart(fig, use_container_width=True)
 
     # --- Top Performer Highlight ---
@@ -98,30 +107,64 @@ if not day_agents.empty:
 else:
     st.warning("No agent data available for this date.")
 
+# --- Deviation Alerts ---
+@section("alerts")
+def alerts_section(selected_date):
+    col_window, col_threshold = st.columns(2)
+    window = col_window.selectbox(
+        "Baseline window", ROLLING_WINDOWS, index=len(ROLLING_WINDOWS) - 1,
+        format_func=lambda d: f"Previous {d} days", key="daily_alert_window",
+    )
+    threshold = col_threshold.slider("Flag at |z| ≥", 1.0, 4.0, ALERT_Z_THRESHOLD, 0.5, key="daily_alert_threshold")
+    alerts = get_deviation_alerts(get_rolling_stats(), selected_date, window, threshold)
+    if alerts.empty:
+        st.info("No agent is outside their usual range on this date.")
+    else:
+        render_table(alerts, height=min(350, 40 + 35 * len(alerts)))
+
+
+st.divider()
+st.markdown("### Deviation Alerts")
+alerts_section(selected_date)
+
 # --- Daily Trend Context (last 7 days) ---
 st.divider()
 st.markdown("### Recent Daily Trend")
-fig_trend = go.Figure()
-for metric in ENGAGEMENT_TYPES:
-    fig_trend.add_trace(go.Bar(
-        x=df_daily["Date"], y=df_daily[metric],
-        name=metric,
-        marker_color=METRIC_COLORS[metric],
-    ))
-fig_trend.update_traces(texttemplate="%{value:,}", textposition="inside")
-fig_trend.update_layout(
-    barmode="stack",
-    template="plotly_dark",
-    height=300,
-    margin=dict(l=20, r=20, t=30, b=20),
-    legend=dict(orientation="h", yanchor="bottom", y=1.02),
-    xaxis_title="", yaxis_title="Engagement",
-    uniformtext_minsize=8, uniformtext_mode="hide",
-)
-# Highlight selected date
-fig_trend.add_vline(
-    x=pd.Timestamp(selected_date).timestamp() * 1000,
-    line_dash="dash", line_color="yellow", line_width=2,
-    annotation_text="Selected", annotation_position="top",
-)
+resolution, window = detail_controls("daily_trend", df_daily["Date"])
+if resolution == "Auto":
+    # Stacked bars can't be thinned point by point, so roll up instead.
+    resolution = auto_resolution(len(apply_detail(df_daily, "Daily", window, ENGAGEMENT_TYPES)))
+trend_data = apply_detail(df_daily, resolution, window, ENGAGEMENT_TYPES)
+
+
+def build_trend():
+    fig_trend = go.Figure()
+    for metric in ENGAGEMENT_TYPES:
+        fig_trend.add_trace(go.Bar(
+            x=trend_data["Date"], y=trend_data[metric],
+            name=metric,
+            marker_color=METRIC_COLORS[metric],
+        ))
+    fig_trend.update_traces(texttemplate="%{value:,}", textposition="inside")
+    fig_trend.update_layout(
+        barmode="stack",
+        template="plotly_dark",
+        height=300,
+        margin=dict(l=20, r=20, t=30, b=20),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+        xaxis_title="", yaxis_title="Engagement",
+        uniformtext_minsize=8, uniformtext_mode="hide",
+    )
+    # Highlight selected date
+    fig_trend.add_vline(
+        x=pd.Timestamp(selected_date).timestamp() * 1000,
+        line_dash="dash", line_color="yellow", line_width=2,
+        annotation_text="Selected", annotation_position="top",
+    )
+    return fig_trend
+
+
+fig_trend = cached_figure("daily", "recent_trend", (selected_date, resolution, window), build_trend, ["raw_daily"])
 st.plotly_chart(fig_trend, use_container_width=True)
+
+perf.finish_run()
@@ -2,14 +2,23 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import plotly.graph_objects as go
+from utils import perf
+from utils.lazy import px
 from utils.sheets_connector import fetch_raw_daily, fetch_raw_agent_daily
-from utils.data_processor import get_weekly_data, get_weekly_agent_data, get_agent_rankings
+from utils.aggregates import weekly_data, weekly_agent_data, period_rankings
+from utils.data_processor import get_period_comparison
 from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES
+from utils.tables import render_table
+from utils.figure_cache import cached_figure
+from utils.fragments import depends_on
+from utils.teams import select_team
+from utils.exports import download_buttons
 
 st.set_page_config(page_title="Weekly Report", page_icon="📊", layout="wide")
+perf.start_run("weekly")
+select_team()
 
 st.markdown("""
 <style>
@@ -32,8 +41,8 @@ if df_daily.empty:
     st.error("No data available.")
     st.stop()
 
-weekly = get_weekly_data(df_daily)
-weekly_agents = get_weekly_agent_data(df_agent_daily)
+weekly = weekly_data(df_daily)
+weekly_agents = weekly_agent_data(df_agent_daily)
 
 if weekly.empty:
     st.warning("Not enough data for weekly reports.")
@@ -73,18 +82,29 @@ a3.metric("Avg Reactions/Day", f"{int(selected_row['Avg_Reactions']):,}")
 a4.metric("Avg Shares/Day", f"{int(selected_row['Avg_Shares']):,}")
 
 # --- WoW Comparison ---
-idx = weekly[weekly["Week_Label"] == selected_week_label].index[0]
-if idx > 0:
-    prev_row = weekly.iloc[idx - 1]
+week_key = f"{sel_year}-W{sel_week:02d}"
+wow = depends_on("week_over_week", (), lambda: get_period_comparison(df_daily, "week"), ["raw_daily"])
+wow = wow[wow["Period"] == week_key]
+if not wow.empty and pd.notna(wow.iloc[0]["Prev_Total"]):
+    wow_row = wow.iloc[0]
     st.divider()
     st.markdown("### Week-over-Week Change")
     wc1, wc2, wc3, wc4 = st.columns(4)
     for col_obj, metric in zip([wc1, wc2, wc3, wc4], ENGAGEMENT_TYPES + ["Total"]):
-        curr = int(selected_row[metric])
-        prev = int(prev_row[metric])
-        delta = curr - prev
-        pct = round(delta / prev * 100, 1) if prev > 0 else 0
-        col_obj.metric(metric, f"{curr:,}", delta=f"{delta:+,} ({pct:+.1f}%)")
+        pct = wow_row[f"Growth_{metric}"]
+        pct = 0 if pd.isna(pct) else pct
+        col_obj.metric(metric, f"{int(wow_row[metric]):,}", delta=f"{int(wow_row[f'Delta_{metric}']):+,} ({pct:+.1f}%)")
+
+    agent_wow = depends_on(
+        "agent_week_over_week", (), lambda: get_period_comparison(df_agent_daily, "week", by="Agent"), ["raw_agent_daily"],
+    )
+    agent_wow = agent_wow[agent_wow["Period"] == week_key]
+    if not agent_wow.empty:
+        st.markdown("#### By Agent")
+        disp = agent_wow[["Agent", "Total", "Prev_Total", "Delta_Total", "Growth_Total"]].rename(columns={
+            "Prev_Total": "Previous Week", "Delta_Total": "Change", "Growth_Total": "Change %",
+        })
+        render_table(disp.sort_values("Change", ascending=False), height=300, hide_index=True)
 
 st.divider()
 
@@ -98,30 +118,34 @@ week_days = df_daily[
 if not week_days.empty:
     col_chart, col_table = st.columns([2, 1])
     with col_chart:
-        fig = go.Figure()
-        for metric in ENGAGEMENT_TYPES:
-            fig.add_trace(go.Bar(
-                x=week_days["Date"].dt.strftime("%a %b %d"),
-                y=week_days[metric],
-                name=metric,
-                marker_color=METRIC_COLORS[metric],
-            ))
-        fig.update_traces(texttemplate="%{value:,}", textposition="inside")
-        fig.update_layout(
-            barmode="stack",
-            template="plotly_dark",
-            height=350,
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02),
-            uniformtext_minsize=8, uniformtext_mode="hide",
-        )
+        def build_daily_breakdown():
+            fig = go.Figure()
+            for metric in ENGAGEMENT_TYPES:
+                fig.add_trace(go.Bar(
+                    x=week_days["Date"].dt.strftime("%a %b %d"),
+                    y=week_days[metric],
+                    name=metric,
+                    marker_color=METRIC_COLORS[metric],
+                ))
+            fig.update_traces(texttemplate="%{value:,}", textposition="inside")
+            fig.update_layout(
+                barmode="stack",
+                template="plotly_dark",
+                height=350,
+                margin=dict(l=20, r=20, t=30, b=20),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                uniformtext_minsize=8, uniformtext_mode="hide",
+            )
+            return fig
+
+        fig = cached_figure("weekly", "daily_breakdown", (sel_year, sel_week), build_daily_breakdown, ["raw_daily"])
         st.plotly_chart(fig, use_container_width=True)
 
     with col_table:
         display = week_days[["Date", "Comments", "Reactions", "Shares", "Total"]].copy()
         display["Date"] = display["Date"].dt.strftime("%a %b %d")
         best_day = display.loc[display["Total"].idxmax()]
-        st.dataframe(display.reset_index(drop=True), use_container_width=True, height=300)
+        render_table(display.reset_index(drop=True), height=300)
         st.success(f"Best day: **{best_day['Date']}** ({int(best_day['Total']):,} total)")
 
 # --- Agent Rankings for the Week ---
@@ -130,27 +154,31 @@ st.markdown("### Agent Rankings (This Week)")
 if not week_days.empty:
     start = week_days["Date"].min()
     end = week_days["Date"].max()
-    rankings = get_agent_rankings(df_agent_daily, start, end)
+    rankings = period_rankings(df_agent_daily, "week", f"{sel_year}-W{sel_week:02d}", start, end)
     if not rankings.empty:
         col_rank, col_bar = st.columns([1, 1])
         with col_rank:
-            disp = rankings[["Agent", "Total", "Comments", "Reactions", "Shares", "% Contribution"]].copy()
-            disp["% Contribution"] = disp["% Contribution"].apply(lambda x: f"{x}%")
-            for c in ["Total", "Comments", "Reactions", "Shares"]:
-                disp[c] = disp[c].apply(lambda x: f"{x:,}")
-            st.dataframe(disp, use_container_width=True, height=350)
+            disp = rankings[["Agent", "Total", "Comments", "Reactions", "Shares", "% Contribution"]]
+            render_table(disp, height=350)
+            download_buttons("Rankings", disp.reset_index(), f"rankings_{week_key}", "weekly_rankings")
 
         with col_bar:
-            fig_bar = px.bar(
-                rankings.reset_index(), x="Agent", y=ENGAGEMENT_TYPES,
-                barmode="stack", color_discrete_map=METRIC_COLORS,
-            )
-            fig_bar.update_traces(texttemplate="%{value:,}", textposition="inside")
-            fig_bar.update_layout(
-                template="plotly_dark", height=350,
-                margin=dict(l=20, r=20, t=30, b=20),
-                legend=dict(orientation="h", yanchor="bottom", y=1.02),
-                xaxis_title="", yaxis_title="Engagement",
-                uniformtext_minsize=8, uniformtext_mode="hide",
-            )
+            def build_bar():
+                fig_bar = px.bar(
+                    rankings.reset_index(), x="Agent", y=ENGAGEMENT_TYPES,
+                    barmode="stack", color_discrete_map=METRIC_COLORS,
+                )
+                fig_bar.update_traces(texttemplate="%{value:,}", textposition="inside")
+                fig_bar.update_layout(
+                    template="plotly_dark", height=350,
+                    margin=dict(l=20, r=20, t=30, b=20),
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                    xaxis_title="", yaxis_title="Engagement",
+                    uniformtext_minsize=8, uniformtext_mode="hide",
+                )
+                return fig_bar
+
+            fig_bar = cached_figure("weekly", "agent_rankings", (sel_year, sel_week), build_bar, ["raw_daily", "raw_agent_daily"])
             st.plotly_chart(fig_bar, use_container_width=True)
+
+perf.finish_run()
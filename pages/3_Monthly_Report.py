@@ -2,14 +2,24 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import plotly.graph_objects as go
+from utils import perf
+from utils.lazy import px
 from utils.sheets_connector import fetch_raw_daily, fetch_raw_agent_daily, fetch_raw_monthly
-from utils.data_processor import get_agent_rankings
+from utils.aggregates import period_rankings
+from utils.data_processor import get_period_comparison
 from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES
+from utils.charts import line_trace
+from utils.tables import render_table
+from utils.figure_cache import cached_figure
+from utils.fragments import depends_on
+from utils.teams import select_team
+from utils.exports import download_buttons
 
 st.set_page_config(page_title="Monthly Report", page_icon="📆", layout="wide")
+perf.start_run("monthly")
+select_team()
 
 st.markdown("""
 <style>
@@ -34,12 +44,12 @@ if df_daily.empty:
     st.stop()
 
 # --- Month Selector ---
-df_daily["Month"] = df_daily["Date"].dt.to_period("M").astype(str)
-months = sorted(df_daily["Month"].unique(), reverse=True)
+month_keys = df_daily["Date"].dt.to_period("M").astype(str)
+months = sorted(month_keys.unique(), reverse=True)
 selected_month = st.sidebar.selectbox("Select Month", months)
 
 # Filter data for selected month
-month_data = df_daily[df_daily["Month"] == selected_month].sort_values("Date")
+month_data = df_daily[month_keys == selected_month].sort_values("Date")
 month_start = month_data["Date"].min()
 month_end = month_data["Date"].max()
 
@@ -50,11 +60,23 @@ totals = month_data[ENGAGEMENT_TYPES + ["Total"]].sum()
 days_in_month = len(month_data)
 daily_avg = totals / days_in_month if days_in_month > 0 else totals * 0
 
+mom = depends_on("month_over_month", (), lambda: get_period_comparison(df_daily, "month"), ["raw_daily"])
+mom = mom[mom["Period"] == selected_month]
+mom_row = mom.iloc[0] if not mom.empty and pd.notna(mom.iloc[0]["Prev_Total"]) else None
+
+
+def mom_delta(metric):
+    if mom_row is None:
+        return None
+    pct = mom_row[f"Growth_{metric}"]
+    return f"{int(mom_row[f'Delta_{metric}']):+,} ({0 if pd.isna(pct) else pct:+.1f}%) vs prev month"
+
+
 c1, c2, c3, c4, c5 = st.columns(5)
-c1.metric("Total Engagement", f"{int(totals['Total']):,}")
-c2.metric("Comments", f"{int(totals['Comments']):,}")
-c3.metric("Reactions", f"{int(totals['Reactions']):,}")
-c4.metric("Shares", f"{int(totals['Shares']):,}")
+c1.metric("Total Engagement", f"{int(totals['Total']):,}", delta=mom_delta("Total"))
+c2.metric("Comments", f"{int(totals['Comments']):,}", delta=mom_delta("Comments"))
+c3.metric("Reactions", f"{int(totals['Reactions']):,}", delta=mom_delta("Reactions"))
+c4.metric("Shares", f"{int(totals['Shares']):,}", delta=mom_delta("Shares"))
 c5.metric("Daily Average", f"{int(daily_avg['Total']):,}")
 
 st.divider()
@@ -64,46 +86,52 @@ st.markdown("### Daily Trend")
 col_trend, col_mix = st.columns([2, 1])
 
 with col_trend:
-    fig = go.Figure()
-    for metric in ENGAGEMENT_TYPES:
-        fig.add_trace(go.Scatter(
-            x=month_data["Date"],
-            y=month_data[metric],
-            name=metric,
-            mode="lines+markers",
-            line=dict(color=METRIC_COLORS[metric], width=2),
+    def build_daily_trend():
+        fig = go.Figure()
+        for metric in ENGAGEMENT_TYPES:
+            fig.add_trace(line_trace(
+                month_data["Date"],
+                month_data[metric],
+                name=metric,
+                line=dict(color=METRIC_COLORS[metric], width=2),
+            ))
+        fig.add_trace(line_trace(
+            month_data["Date"],
+            month_data["Total"],
+            name="Total",
+            line=dict(color=METRIC_COLORS["Total"], width=3, dash="dash"),
         ))
-    fig.add_trace(go.Scatter(
-        x=month_data["Date"],
-        y=month_data["Total"],
-        name="Total",
-        mode="lines+markers",
-        line=dict(color=METRIC_COLORS["Total"], width=3, dash="dash"),
-    ))
-    fig.update_layout(
-        template="plotly_dark",
-        height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02),
-        hovermode="x unified",
-    )
+        fig.update_layout(
+            template="plotly_dark",
+            height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02),
+            hovermode="x unified",
+        )
+        return fig
+
+    fig = cached_figure("monthly", "daily_trend", selected_month, build_daily_trend, ["raw_daily"])
     st.plotly_chart(fig, use_container_width=True)
 
 with col_mix:
     st.markdown("### Engagement Composition")
     mix_vals = [int(totals[m]) for m in ENGAGEMENT_TYPES]
-    fig_pie = px.pie(
-        values=mix_vals, names=ENGAGEMENT_TYPES,
-        hole=0.5,
-        color=ENGAGEMENT_TYPES,
-        color_discrete_map=METRIC_COLORS,
-    )
-    fig_pie.update_layout(
-        template="plotly_dark", height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-    )
-    fig_pie.update_traces(textposition="inside", textinfo="value+percent+label")
+    def build_pie():
+        fig_pie = px.pie(
+            values=mix_vals, names=ENGAGEMENT_TYPES,
+            hole=0.5,
+            color=ENGAGEMENT_TYPES,
+            color_discrete_map=METRIC_COLORS,
+        )
+        fig_pie.update_layout(
+            template="plotly_dark", height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+        )
+        fig_pie.update_traces(textposition="inside", textinfo="value+percent+label")
+        return fig_pie
+
+    fig_pie = cached_figure("monthly", "composition", selected_month, build_pie, ["raw_daily"])
     st.plotly_chart(fig_pie, use_container_width=True)
 
 # --- Calendar Heatmap ---
@@ -113,69 +141,94 @@ heatmap_data = month_data[["Date", "Total"]].copy()
 heatmap_data["Day"] = heatmap_data["Date"].dt.day
 heatmap_data["Weekday"] = heatmap_data["Date"].dt.day_name()
 
-fig_heat = px.bar(
-    heatmap_data,
-    x=heatmap_data["Date"].dt.strftime("%b %d (%a)"),
-    y="Total",
-    color="Total",
-    color_continuous_scale="Blues",
-)
-fig_heat.update_traces(texttemplate="%{value:,}", textposition="outside")
-fig_heat.update_layout(
-    template="plotly_dark", height=300,
-    margin=dict(l=20, r=20, t=30, b=20),
-    xaxis_title="", yaxis_title="Total Engagement",
-    coloraxis_showscale=False,
-)
+def build_heat():
+    fig_heat = px.bar(
+        heatmap_data,
+        x=heatmap_data["Date"].dt.strftime("%b %d (%a)"),
+        y="Total",
+        color="Total",
+        color_continuous_scale="Blues",
+    )
+    fig_heat.update_traces(texttemplate="%{value:,}", textposition="outside")
+    fig_heat.update_layout(
+        template="plotly_dark", height=300,
+        margin=dict(l=20, r=20, t=30, b=20),
+        xaxis_title="", yaxis_title="Total Engagement",
+        coloraxis_showscale=False,
+    )
+    return fig_heat
+
+fig_heat = cached_figure("monthly", "daily_heatmap", selected_month, build_heat, ["raw_daily"])
 st.plotly_chart(fig_heat, use_container_width=True)
 
 # --- Monthly Agent Leaderboard ---
 st.divider()
 st.markdown("### Agent Leaderboard")
-rankings = get_agent_rankings(df_agent_daily, month_start, month_end)
+rankings = period_rankings(df_agent_daily, "month", selected_month, month_start, month_end)
 
 if not rankings.empty:
     col_rank, col_bar = st.columns([1, 1])
     with col_rank:
-        disp = rankings[["Agent", "Total", "Comments", "Reactions", "Shares", "% Contribution", "Avg/Day"]].copy()
-        disp["% Contribution"] = disp["% Contribution"].apply(lambda x: f"{x}%")
-        for c in ["Total", "Comments", "Reactions", "Shares"]:
-            disp[c] = disp[c].apply(lambda x: f"{x:,}")
-        st.dataframe(disp, use_container_width=True, height=400)
+        disp = rankings[["Agent", "Total", "Comments", "Reactions", "Shares", "% Contribution", "Avg/Day"]]
+        render_table(disp, height=400)
+        download_buttons("Leaderboard", disp.reset_index(), f"leaderboard_{selected_month}", "monthly_leaderboard")
 
     with col_bar:
-        fig_bar = px.bar(
-            rankings.reset_index(),
-            x="Agent", y=ENGAGEMENT_TYPES,
-            barmode="stack",
-            color_discrete_map=METRIC_COLORS,
-        )
-        fig_bar.update_traces(texttemplate="%{value:,}", textposition="inside")
-        fig_bar.update_layout(
-            template="plotly_dark", height=400,
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02),
-            xaxis_title="", yaxis_title="Engagement",
-            uniformtext_minsize=8, uniformtext_mode="hide",
-        )
+        def build_bar():
+            fig_bar = px.bar(
+                rankings.reset_index(),
+                x="Agent", y=ENGAGEMENT_TYPES,
+                barmode="stack",
+                color_discrete_map=METRIC_COLORS,
+            )
+            fig_bar.update_traces(texttemplate="%{value:,}", textposition="inside")
+            fig_bar.update_layout(
+                template="plotly_dark", height=400,
+                margin=dict(l=20, r=20, t=30, b=20),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                xaxis_title="", yaxis_title="Engagement",
+                uniformtext_minsize=8, uniformtext_mode="hide",
+            )
+            return fig_bar
+
+        fig_bar = cached_figure("monthly", "agent_leaderboard", selected_month, build_bar, ["raw_daily", "raw_agent_daily"])
         st.plotly_chart(fig_bar, use_container_width=True)
 
+# --- Agent Month-over-Month ---
+if mom_row is not None:
+    agent_mom = depends_on(
+        "agent_month_over_month", (), lambda: get_period_comparison(df_agent_daily, "month", by="Agent"), ["raw_agent_daily"],
+    )
+    agent_mom = agent_mom[agent_mom["Period"] == selected_month]
+    if not agent_mom.empty:
+        st.divider()
+        st.markdown("### Agent Month-over-Month")
+        disp = agent_mom[["Agent"] + [c for m in ENGAGEMENT_TYPES + ["Total"] for c in (m, f"Growth_{m}")]]
+        disp = disp.rename(columns={f"Growth_{m}": f"{m} Δ%" for m in ENGAGEMENT_TYPES + ["Total"]})
+        render_table(disp.sort_values("Total", ascending=False), height=350, hide_index=True)
+
 # --- Month-over-Month (if multiple months) ---
 if len(months) > 1 and not df_monthly.empty:
     st.divider()
     st.markdown("### Month-over-Month Trend")
-    fig_mom = go.Figure()
-    for metric in ENGAGEMENT_TYPES:
-        if metric in df_monthly.columns:
-            fig_mom.add_trace(go.Bar(
-                x=df_monthly["Month"], y=df_monthly[metric],
-                name=metric, marker_color=METRIC_COLORS[metric],
-            ))
-    fig_mom.update_traces(texttemplate="%{value:,}", textposition="inside")
-    fig_mom.update_layout(
-        barmode="stack", template="plotly_dark", height=300,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02),
-        uniformtext_minsize=8, uniformtext_mode="hide",
-    )
+    def build_mom():
+        fig_mom = go.Figure()
+        for metric in ENGAGEMENT_TYPES:
+            if metric in df_monthly.columns:
+                fig_mom.add_trace(go.Bar(
+                    x=df_monthly["Month"], y=df_monthly[metric],
+                    name=metric, marker_color=METRIC_COLORS[metric],
+                ))
+        fig_mom.update_traces(texttemplate="%{value:,}", textposition="inside")
+        fig_mom.update_layout(
+            barmode="stack", template="plotly_dark", height=300,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02),
+            uniformtext_minsize=8, uniformtext_mode="hide",
+        )
+        return fig_mom
+
+    fig_mom = cached_figure("monthly", "month_over_month", (), build_mom, ["raw_monthly"])
     st.plotly_chart(fig_mom, use_container_width=True)
+
+perf.finish_run()
@@ -2,15 +2,28 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
-from utils.sheets_connector import fetch_raw_agent_daily, fetch_agent_list, fetch_raw_daily, fetch_account_data
-from utils.data_processor import get_agent_rankings, get_account_by_agent
-from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES, ACCOUNT_STATUS_COLORS
+import plotly.graph_objects as go
+from utils import perf
+from utils.lazy import px
+from utils.sheets_connector import fetch_datasets
+from utils.data_processor import (
+    filter_by_date, get_agent_profiles, get_consistency_leaderboard, get_account_by_agent,
+    get_rank_history, get_rank_summary,
+)
+from config.settings import METRIC_COLORS, ENGAGEMENT_TYPES, ACCOUNT_STATUS_COLORS, CHART_POINT_BUDGET, ROLLING_WINDOWS
+from utils.charts import line_trace, apply_detail, detail_controls, rank_bump
+from utils.account_explorer import render_account_explorer
+from utils.tables import render_table
+from utils.figure_cache import cached_figure
+from utils.fragments import depends_on, section
+from utils.rolling import get_rolling_stats
+from utils.teams import select_team
 
 st.set_page_config(page_title="Individual Agent", page_icon="👤", layout="wide")
+perf.start_run("agent")
+select_team()
 
 st.markdown("""
 <style>
@@ -31,10 +44,9 @@ st.markdown("""
 st.title("Individual Agent Report")
 
 with st.spinner("Loading..."):
-    df_agent_daily = fetch_raw_agent_daily()
-    df_daily = fetch_raw_daily()
-    agents = fetch_agent_list()
-    df_accounts = fetch_account_data()
+    df_agent_daily, df_daily, agents, df_accounts = fetch_datasets(
+        "raw_agent_daily", "raw_daily", "agent_list", "account_data",
+    )
 
 if df_agent_daily.empty:
     st.error("No data available.")
@@ -66,29 +78,28 @@ all_agents_period = df_agent_daily[
 st.markdown(f'<p class="agent-header">{selected_agent}</p>', unsafe_allow_html=True)
 
 # --- Profile KPIs ---
-total_engagement = int(agent_data["Total"].sum())
-total_comments = int(agent_data["Comments"].sum())
-total_reactions = int(agent_data["Reactions"].sum())
-total_shares = int(agent_data["Shares"].sum())
-days_active = int((agent_data["Total"] > 0).sum())
-total_days = int(len(agent_data))
-avg_per_day = int(total_engagement / days_active) if days_active > 0 else 0
-
-# Rank
-rankings = get_agent_rankings(df_agent_daily, start_date, end_date)
-rank = "N/A"
-contribution = "0%"
-if not rankings.empty and selected_agent in rankings["Agent"].values:
-    agent_rank_row = rankings[rankings["Agent"] == selected_agent]
-    rank = agent_rank_row.index[0]
-    contribution = f"{agent_rank_row['% Contribution'].values[0]}%"
-
-# Consistency score (coefficient of variation - lower is more consistent)
-active_days_data = agent_data[agent_data["Total"] > 0]["Total"]
-if len(active_days_data) > 1:
-    cv = (active_days_data.std() / active_days_data.mean() * 100)
-    consistency = max(0, round(100 - cv, 1))
+stats = get_rolling_stats()
+profiles = depends_on(
+    "agent_profiles", (start_date, end_date),
+    lambda: get_agent_profiles(df_agent_daily, start_date, end_date, stats=stats), ["raw_agent_daily"],
+)
+if selected_agent in profiles.index:
+    profile = profiles.loc[selected_agent]
+    total_engagement = int(profile["Total"])
+    total_comments = int(profile["Comments"])
+    total_reactions = int(profile["Reactions"])
+    total_shares = int(profile["Shares"])
+    days_active = int(profile["Days Active"])
+    total_days = int(profile["Total Days"])
+    avg_per_day = int(profile["Avg/Day"])
+    rank = int(profile["Rank"])
+    contribution = f"{profile['% Contribution']}%"
+    consistency = float(profile["Consistency"])
 else:
+    total_engagement = total_comments = total_reactions = total_shares = 0
+    days_active = total_days = avg_per_day = 0
+    rank = "N/A"
+    contribution = "0%"
     consistency = 100.0
 
 c1, c2, c3, c4, c5, c6 = st.columns(6)
@@ -99,48 +110,102 @@ c4.metric("Avg/Day", f"{avg_per_day:,}")
 c5.metric("Days Active", f"{days_active}/{total_days}")
 c6.metric("Consistency", f"{consistency}%")
 
-st.divider()
+# --- Rolling Averages ---
+st.markdown("### Rolling Averages")
+longest = max(ROLLING_WINDOWS)
+scores = stats.zscores(end_date, longest)
+latest = scores.loc[selected_agent] if selected_agent in scores.index else None
+rolling_cols = st.columns(len(ROLLING_WINDOWS) + 2)
+for col, days in zip(rolling_cols, ROLLING_WINDOWS):
+    row = stats.window(selected_agent, end_date, days)
+    mean = row["Mean"] if row is not None else np.nan
+    col.metric(f"{days}-Day Avg/Day", f"{mean:,.0f}" if pd.notna(mean) else "N/A")
+row = stats.window(selected_agent, end_date, longest)
+cv = row["CV"] if row is not None else np.nan
+rolling_cols[-2].metric(f"{longest}-Day Variation", f"{cv:.1f}%" if pd.notna(cv) else "N/A")
+z = latest["Z-Score"] if latest is not None else np.nan
+rolling_cols[-1].metric(f"{pd.Timestamp(end_date):%b %d} vs {longest}-Day", f"{z:+.2f}σ" if pd.notna(z) else "N/A")
 
-# --- Performance Charts ---
-col_line, col_pie = st.columns([2, 1])
 
-with col_line:
-    st.markdown("### Daily Performance")
+def build_rolling():
     fig = go.Figure()
-    for metric in ENGAGEMENT_TYPES:
-        fig.add_trace(go.Scatter(
-            x=agent_data["Date"], y=agent_data[metric],
-            name=metric, mode="lines+markers",
-            line=dict(color=METRIC_COLORS[metric], width=2),
+    for i, days in enumerate(ROLLING_WINDOWS):
+        series = stats.rolling_mean(selected_agent, days, start_date, end_date)
+        fig.add_trace(line_trace(
+            series.index, series.values, name=f"{days}-day average", markers=False,
+            line=dict(color=METRIC_COLORS["Total"], width=2, dash="solid" if i == 0 else "dash"),
         ))
-    fig.add_trace(go.Scatter(
-        x=agent_data["Date"], y=agent_data["Total"],
-        name="Total", mode="lines+markers",
-        line=dict(color=METRIC_COLORS["Total"], width=3, dash="dash"),
-    ))
     fig.update_layout(
-        template="plotly_dark", height=400,
+        template="plotly_dark", height=300,
         margin=dict(l=20, r=20, t=30, b=20),
         legend=dict(orientation="h", yanchor="bottom", y=1.02),
-        hovermode="x unified",
+        hovermode="x unified", yaxis_title="Total Engagement",
     )
+    return fig
+
+
+fig_rolling = cached_figure("agent", "rolling_average", (selected_agent, start_date, end_date), build_rolling, ["raw_agent_daily"])
+st.plotly_chart(fig_rolling, use_container_width=True)
+
+st.divider()
+
+# --- Performance Charts ---
+@section("trend")
+def trend_section(agent_data, selected_agent, start_date, end_date):
+    resolution, window = detail_controls("agent_trend", agent_data["Date"]) if not agent_data.empty else ("Auto", None)
+    trend_data = apply_detail(agent_data, resolution, window, ENGAGEMENT_TYPES + ["Total"])
+    budget = None if resolution == "Daily" else CHART_POINT_BUDGET
+
+    def build_daily_performance():
+        fig = go.Figure()
+        for metric in ENGAGEMENT_TYPES:
+            fig.add_trace(line_trace(
+                trend_data["Date"], trend_data[metric],
+                name=metric, budget=budget,
+                line=dict(color=METRIC_COLORS[metric], width=2),
+            ))
+        fig.add_trace(line_trace(
+            trend_data["Date"], trend_data["Total"],
+            name="Total", budget=budget,
+            line=dict(color=METRIC_COLORS["Total"], width=3, dash="dash"),
+        ))
+        fig.update_layout(
+            template="plotly_dark", height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02),
+            hovermode="x unified",
+        )
+        return fig
+
+    fig = cached_figure("agent", "daily_performance", (selected_agent, start_date, end_date, resolution, window), build_daily_performance, ["raw_agent_daily"])
     st.plotly_chart(fig, use_container_width=True)
 
+
+col_line, col_pie = st.columns([2, 1])
+
+with col_line:
+    st.markdown("### Daily Performance")
+    trend_section(agent_data, selected_agent, start_date, end_date)
+
 with col_pie:
     st.markdown("### Engagement Breakdown")
-    fig_pie = px.pie(
-        values=[total_comments, total_reactions, total_shares],
-        names=ENGAGEMENT_TYPES,
-        hole=0.5,
-        color=ENGAGEMENT_TYPES,
-        color_discrete_map=METRIC_COLORS,
-    )
-    fig_pie.update_layout(
-        template="plotly_dark", height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-    )
-    fig_pie.update_traces(textposition="inside", textinfo="value+percent+label")
+    def build_pie():
+        fig_pie = px.pie(
+            values=[total_comments, total_reactions, total_shares],
+            names=ENGAGEMENT_TYPES,
+            hole=0.5,
+            color=ENGAGEMENT_TYPES,
+            color_discrete_map=METRIC_COLORS,
+        )
+        fig_pie.update_layout(
+            template="plotly_dark", height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+        )
+        fig_pie.update_traces(textposition="inside", textinfo="value+percent+label")
+        return fig_pie
+
+    fig_pie = cached_figure("agent", "engagement_breakdown", (selected_agent, start_date, end_date), build_pie, ["raw_agent_daily"])
     st.plotly_chart(fig_pie, use_container_width=True)
 
 # --- Agent vs Team Average ---
@@ -149,29 +214,73 @@ st.markdown("### Agent vs Team Average")
 team_avg = all_agents_period.groupby("Date")[ENGAGEMENT_TYPES + ["Total"]].mean().reset_index()
 team_avg = team_avg.sort_values("Date")
 
-fig_compare = go.Figure()
-fig_compare.add_trace(go.Bar(
-    x=agent_data["Date"].dt.strftime("%b %d"),
-    y=agent_data["Total"],
-    name=selected_agent,
-    marker_color="#4F8BF9",
-))
-fig_compare.add_trace(go.Scatter(
-    x=team_avg["Date"].dt.strftime("%b %d"),
-    y=team_avg["Total"],
-    name="Team Average",
-    mode="lines+markers",
-    line=dict(color="#EF553B", width=2, dash="dash"),
-))
-fig_compare.update_traces(texttemplate="%{value:,}", textposition="outside", selector=dict(type="bar"))
-fig_compare.update_layout(
-    template="plotly_dark", height=350,
-    margin=dict(l=20, r=20, t=30, b=20),
-    legend=dict(orientation="h", yanchor="bottom", y=1.02),
-    xaxis_title="", yaxis_title="Total Engagement",
-)
+def build_compare():
+    fig_compare = go.Figure()
+    fig_compare.add_trace(go.Bar(
+        x=agent_data["Date"].dt.strftime("%b %d"),
+        y=agent_data["Total"],
+        name=selected_agent,
+        marker_color="#4F8BF9",
+    ))
+    fig_compare.add_trace(go.Scatter(
+        x=team_avg["Date"].dt.strftime("%b %d"),
+        y=team_avg["Total"],
+        name="Team Average",
+        mode="lines+markers",
+        line=dict(color="#EF553B", width=2, dash="dash"),
+    ))
+    fig_compare.update_traces(texttemplate="%{value:,}", textposition="outside", selector=dict(type="bar"))
+    fig_compare.update_layout(
+        template="plotly_dark", height=350,
+        margin=dict(l=20, r=20, t=30, b=20),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+        xaxis_title="", yaxis_title="Total Engagement",
+    )
+    return fig_compare
+
+fig_compare = cached_figure("agent", "vs_team_average", (selected_agent, start_date, end_date), build_compare, ["raw_agent_daily"])
 st.plotly_chart(fig_compare, use_container_width=True)
 
+# --- Rank History ---
+@section("rank_history")
+def rank_history_section(selected_agent, start_date, end_date):
+    kind = st.radio("Period", ["week", "month"], format_func=str.title, horizontal=True, key="agent_rank_period")
+    period = (start_date, end_date, kind)
+    history = depends_on(
+        "rank_history", period,
+        lambda: get_rank_history(filter_by_date(df_agent_daily, start_date, end_date), kind), ["raw_agent_daily"],
+    )
+    summary = depends_on("rank_summary", period, lambda: get_rank_summary(history), ["raw_agent_daily"])
+    if selected_agent not in summary.index:
+        st.info("This agent has no ranked periods in the selected range.")
+        return
+    row = summary.loc[selected_agent]
+    r1, r2, r3, r4 = st.columns(4)
+    r1.metric("Latest Rank", f"#{int(row['Latest Rank'])}")
+    r2.metric("Best Rank", f"#{int(row['Best Rank'])}")
+    r3.metric("Worst Rank", f"#{int(row['Worst Rank'])}")
+    r4.metric("Volatility", f"{row['Volatility']:.2f}", help="Average places moved between consecutive periods")
+
+    fig = cached_figure(
+        "agent", "rank_bump", (selected_agent, start_date, end_date, kind),
+        lambda: rank_bump(history, highlight=selected_agent), ["raw_agent_daily"],
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+st.divider()
+st.markdown("### Rank History")
+rank_history_section(selected_agent, start_date, end_date)
+
+# --- Consistency Leaderboard ---
+st.divider()
+st.markdown("### Consistency Leaderboard")
+leaderboard = get_consistency_leaderboard(profiles)
+if not leaderboard.empty:
+    render_table(leaderboard, height=350)
+else:
+    st.info("Not enough active days in this range to score consistency.")
+
 # --- Account Status Section ---
 st.divider()
 st.markdown("### Account Status")
@@ -191,18 +300,22 @@ if not agent_accounts.empty:
 
     with col_acct_pie:
         status_counts = agent_accounts["Account Status"].value_counts()
-        fig_acct = px.pie(
-            values=status_counts.values,
-            names=status_counts.index,
-            hole=0.5,
-            color=status_counts.index,
-            color_discrete_map=ACCOUNT_STATUS_COLORS,
-        )
-        fig_acct.update_layout(
-            template="plotly_dark", height=300,
-            margin=dict(l=20, r=20, t=30, b=20),
-        )
-        fig_acct.update_traces(textposition="inside", textinfo="value+percent+label")
+        def build_acct():
+            fig_acct = px.pie(
+                values=status_counts.values,
+                names=status_counts.index,
+                hole=0.5,
+                color=status_counts.index,
+                color_discrete_map=ACCOUNT_STATUS_COLORS,
+            )
+            fig_acct.update_layout(
+                template="plotly_dark", height=300,
+                margin=dict(l=20, r=20, t=30, b=20),
+            )
+            fig_acct.update_traces(textposition="inside", textinfo="value+percent+label")
+            return fig_acct
+
+        fig_acct = cached_figure("agent", "account_status", selected_agent, build_acct, ["account_data"])
         st.plotly_chart(fig_acct, use_container_width=True)
 
     with col_acct_timeline:
@@ -210,16 +323,25 @@ if not agent_accounts.empty:
         if not dated.empty:
             dated["Month"] = dated["Created Date"].dt.to_period("M").astype(str)
             timeline = dated.groupby("Month").size().reset_index(name="Accounts Created")
-            fig_tl = px.bar(
-                timeline, x="Month", y="Accounts Created",
-                color_discrete_sequence=["#4F8BF9"],
-            )
-            fig_tl.update_traces(texttemplate="%{value}", textposition="outside")
-            fig_tl.update_layout(
-                template="plotly_dark", height=300,
-                margin=dict(l=20, r=20, t=30, b=20),
-                xaxis_title="", yaxis_title="Accounts",
-            )
+            def build_tl():
+                fig_tl = px.bar(
+                    timeline, x="Month", y="Accounts Created",
+                    color_discrete_sequence=["#4F8BF9"],
+                )
+                fig_tl.update_traces(texttemplate="%{value}", textposition="outside")
+                fig_tl.update_layout(
+                    template="plotly_dark", height=300,
+                    margin=dict(l=20, r=20, t=30, b=20),
+                    xaxis_title="", yaxis_title="Accounts",
+                )
+                return fig_tl
+
+            fig_tl = cached_figure("agent", "account_timeline", selected_agent, build_tl, ["account_data"])
             st.plotly_chart(fig_tl, use_container_width=True)
+
+    st.markdown("#### Accounts")
+    render_account_explorer("agent_explorer", agents=[selected_agent])
 else:
     st.info("No account data available for this agent.")
+
+perf.finish_run()
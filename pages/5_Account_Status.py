@@ -2,14 +2,23 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import plotly.graph_objects as go
+from utils import perf
+from utils.lazy import px
 from utils.sheets_connector import fetch_account_data
-from utils.data_processor import get_account_summary, get_account_by_agent, get_account_creation_timeline
+from utils.data_processor import get_account_summary, get_account_by_agent, get_account_creation_timeline, health_labels
 from config.settings import ACCOUNT_STATUS_COLORS
+from utils.account_explorer import render_account_explorer
+from utils.tables import render_table
+from utils.figure_cache import cached_figure
+from utils.fragments import depends_on
+from utils.teams import select_team
+from utils.exports import download_buttons
 
 st.set_page_config(page_title="Account Status", page_icon="📋", layout="wide")
+perf.start_run("accounts")
+select_team()
 
 st.markdown("""
 <style>
@@ -43,7 +52,8 @@ if agent_filter != "All Agents":
     filtered = filtered[filtered["Agent"] == agent_filter]
 
 # --- Overall KPIs ---
-summary = get_account_summary(filtered)
+filters = (agent_filter, tuple(status_filter))
+summary = depends_on("accounts_summary", filters, lambda: get_account_summary(filtered), ["account_data"])
 total = summary.get("total", 0)
 active = summary.get("active", 0)
 active_pct = summary.get("active_pct", 0)
@@ -66,102 +76,124 @@ col_pie, col_bar = st.columns([1, 1])
 with col_pie:
     st.markdown("### Account Status Distribution")
     status_counts = filtered["Account Status"].value_counts()
-    fig_pie = px.pie(
-        values=status_counts.values,
-        names=status_counts.index,
-        hole=0.5,
-        color=status_counts.index,
-        color_discrete_map=ACCOUNT_STATUS_COLORS,
-    )
-    fig_pie.update_layout(
-        template="plotly_dark", height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=-0.3),
-    )
-    fig_pie.update_traces(textposition="inside", textinfo="value+percent+label")
+    def build_pie():
+        fig_pie = px.pie(
+            values=status_counts.values,
+            names=status_counts.index,
+            hole=0.5,
+            color=status_counts.index,
+            color_discrete_map=ACCOUNT_STATUS_COLORS,
+        )
+        fig_pie.update_layout(
+            template="plotly_dark", height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=-0.3),
+        )
+        fig_pie.update_traces(textposition="inside", textinfo="value+percent+label")
+        return fig_pie
+
+    fig_pie = cached_figure("accounts", "status_distribution", (agent_filter, status_filter), build_pie, ["account_data"])
     st.plotly_chart(fig_pie, use_container_width=True)
 
 with col_bar:
     st.markdown("### Accounts by Agent")
     agent_status = filtered.groupby(["Agent", "Account Status"]).size().reset_index(name="Count")
-    fig_bar = px.bar(
-        agent_status,
-        x="Agent", y="Count", color="Account Status",
-        barmode="stack",
-        color_discrete_map=ACCOUNT_STATUS_COLORS,
-    )
-    fig_bar.update_traces(texttemplate="%{value}", textposition="inside")
-    fig_bar.update_layout(
-        template="plotly_dark", height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.05),
-        xaxis_title="", yaxis_title="Accounts",
-        uniformtext_minsize=8, uniformtext_mode="hide",
-    )
+    def build_bar():
+        fig_bar = px.bar(
+            agent_status,
+            x="Agent", y="Count", color="Account Status",
+            barmode="stack",
+            color_discrete_map=ACCOUNT_STATUS_COLORS,
+        )
+        fig_bar.update_traces(texttemplate="%{value}", textposition="inside")
+        fig_bar.update_layout(
+            template="plotly_dark", height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.05),
+            xaxis_title="", yaxis_title="Accounts",
+            uniformtext_minsize=8, uniformtext_mode="hide",
+        )
+        return fig_bar
+
+    fig_bar = cached_figure("accounts", "accounts_by_agent", (agent_filter, status_filter), build_bar, ["account_data"])
     st.plotly_chart(fig_bar, use_container_width=True)
 
 # --- Agent Health Table ---
 st.divider()
 st.markdown("### Agent Account Health")
-agent_summary = get_account_by_agent(filtered)
+agent_summary = depends_on("accounts_by_agent", filters, lambda: get_account_by_agent(filtered), ["account_data"])
 
 if not agent_summary.empty:
-    display = agent_summary.copy()
-    display = display.reset_index()
+    display = agent_summary.reset_index()
 
     # Health status indicator
-    def health_label(pct):
-        if pct >= 80:
-            return "Healthy"
-        elif pct >= 60:
-            return "Fair"
-        else:
-            return "At Risk"
-
     if "Active %" in display.columns:
-        display["Health"] = display["Active %"].apply(health_label)
+        display["Health"] = health_labels(display["Active %"])
 
-    st.dataframe(display, use_container_width=True, height=350)
+    render_table(display, height=350)
+    download_buttons("Agent health", display, "account_health", "accounts_health")
+    download_buttons("Accounts", filtered, "accounts", "accounts_rows")
 
     # Health comparison bar
     if "Active %" in display.columns:
-        fig_health = px.bar(
-            display.sort_values("Active %", ascending=True),
-            x="Active %", y="Agent",
-            orientation="h",
-            color="Active %",
-            color_continuous_scale=["#EF553B", "#FECB52", "#00CC96"],
-            range_color=[0, 100],
-        )
-        fig_health.add_vline(x=80, line_dash="dash", line_color="white", annotation_text="Target 80%")
-        fig_health.update_traces(texttemplate="%{x:.1f}%", textposition="inside")
-        fig_health.update_layout(
-            template="plotly_dark", height=350,
-            margin=dict(l=20, r=20, t=30, b=20),
-            yaxis_title="", xaxis_title="Active %",
-            coloraxis_showscale=False,
-        )
+        def build_health():
+            fig_health = px.bar(
+                display.sort_values("Active %", ascending=True),
+                x="Active %", y="Agent",
+                orientation="h",
+                color="Active %",
+                color_continuous_scale=["#EF553B", "#FECB52", "#00CC96"],
+                range_color=[0, 100],
+            )
+            fig_health.add_vline(x=80, line_dash="dash", line_color="white", annotation_text="Target 80%")
+            fig_health.update_traces(texttemplate="%{x:.1f}%", textposition="inside")
+            fig_health.update_layout(
+                template="plotly_dark", height=350,
+                margin=dict(l=20, r=20, t=30, b=20),
+                yaxis_title="", xaxis_title="Active %",
+                coloraxis_showscale=False,
+            )
+            return fig_health
+
+        fig_health = cached_figure("accounts", "agent_health", (agent_filter, status_filter), build_health, ["account_data"])
         st.plotly_chart(fig_health, use_container_width=True)
 
+# --- Account Explorer ---
+st.divider()
+st.markdown("### Account Explorer")
+render_account_explorer(
+    "accounts_explorer",
+    agents=None if agent_filter == "All Agents" else [agent_filter],
+    statuses=status_filter,
+)
+
 # --- Account Creation Timeline ---
 st.divider()
 st.markdown("### Account Creation Timeline")
-timeline = get_account_creation_timeline(filtered)
+timeline = depends_on(
+    "accounts_timeline", filters, lambda: get_account_creation_timeline(filtered), ["account_data"],
+)
 
 if not timeline.empty:
-    fig_tl = px.bar(
-        timeline,
-        x="Month", y="Count", color="Agent",
-        barmode="stack",
-    )
-    fig_tl.update_traces(texttemplate="%{value}", textposition="inside")
-    fig_tl.update_layout(
-        template="plotly_dark", height=350,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.05),
-        xaxis_title="", yaxis_title="Accounts Created",
-        uniformtext_minsize=8, uniformtext_mode="hide",
-    )
+    def build_tl():
+        fig_tl = px.bar(
+            timeline,
+            x="Month", y="Count", color="Agent",
+            barmode="stack",
+        )
+        fig_tl.update_traces(texttemplate="%{value}", textposition="inside")
+        fig_tl.update_layout(
+            template="plotly_dark", height=350,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.05),
+            xaxis_title="", yaxis_title="Accounts Created",
+            uniformtext_minsize=8, uniformtext_mode="hide",
+        )
+        return fig_tl
+
+    fig_tl = cached_figure("accounts", "creation_timeline", (agent_filter, status_filter), build_tl, ["account_data"])
     st.plotly_chart(fig_tl, use_container_width=True)
 else:
     st.info("No creation date data available.")
+
+perf.finish_run()
@@ -2,17 +2,27 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import plotly.graph_objects as go
+from utils import perf
+from utils.lazy import px
 from utils.sheets_connector import fetch_task_daily, fetch_raw_daily
 from utils.data_processor import (
     get_task_distribution, get_task_by_agent,
-    get_task_daily_trend, get_task_agent_matrix, filter_by_date,
+    get_task_daily_trend, get_task_agent_matrix,
+    get_available_dates, get_distinct_values,
 )
-from config.settings import TASK_COLORS
+from config.settings import TASK_COLORS, CHART_POINT_BUDGET
+from utils.charts import line_trace, apply_detail, detail_controls
+from utils.tables import render_table
+from utils.figure_cache import cached_figure
+from utils.fragments import depends_on, section
+from utils.teams import select_team
+from utils.exports import download_buttons
 
 st.set_page_config(page_title="Task Distribution", page_icon="📊", layout="wide")
+perf.start_run("tasks")
+select_team()
 
 st.markdown("""
 <style>
@@ -36,7 +46,7 @@ if df_task.empty:
     st.stop()
 
 # --- Sidebar Filters ---
-available_dates = sorted(df_task["Date"].dt.date.unique())
+available_dates = depends_on("tasks_dates", (), lambda: get_available_dates(df_task), ["task_daily"])
 start_date = st.sidebar.date_input(
     "Start Date",
     value=available_dates[0],
@@ -50,11 +60,11 @@ end_date = st.sidebar.date_input(
     max_value=available_dates[-1],
 )
 
-task_options = ["All Tasks"] + sorted(df_task["Task"].dropna().unique().tolist())
-selected_task = st.sidebar.selectbox("Task Type", task_options)
-
 # --- KPIs ---
-dist = get_task_distribution(df_task, start_date, end_date)
+dist = depends_on(
+    "tasks_distribution", (start_date, end_date),
+    lambda: get_task_distribution(df_task, start_date, end_date), ["task_daily"],
+)
 if dist.empty:
     st.warning("No data for selected date range.")
     st.stop()
@@ -74,86 +84,138 @@ col_pie, col_bar = st.columns([1, 1])
 
 with col_pie:
     st.markdown("### Comment Distribution by Task")
-    fig_pie = px.pie(
-        dist, values="Total", names="Task",
-        color="Task", color_discrete_map=TASK_COLORS,
-        hole=0.4,
-    )
-    fig_pie.update_traces(textposition="inside", textinfo="percent+label")
-    fig_pie.update_layout(
-        template="plotly_dark",
-        height=400,
-        margin=dict(l=20, r=20, t=30, b=20),
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=-0.15),
-    )
+    def build_pie():
+        fig_pie = px.pie(
+            dist, values="Total", names="Task",
+            color="Task", color_discrete_map=TASK_COLORS,
+            hole=0.4,
+        )
+        fig_pie.update_traces(textposition="inside", textinfo="percent+label")
+        fig_pie.update_layout(
+            template="plotly_dark",
+            height=400,
+            margin=dict(l=20, r=20, t=30, b=20),
+            showlegend=True,
+            legend=dict(orientation="h", yanchor="bottom", y=-0.15),
+        )
+        return fig_pie
+
+    fig_pie = cached_figure("tasks", "distribution", (start_date, end_date), build_pie, ["task_daily"])
     st.plotly_chart(fig_pie, use_container_width=True)
 
 with col_bar:
     st.markdown("### Task Breakdown by Agent")
-    task_by_agent = get_task_by_agent(df_task, start_date, end_date)
+    task_by_agent = depends_on(
+        "tasks_by_agent", (start_date, end_date),
+        lambda: get_task_by_agent(df_task, start_date, end_date), ["task_daily"],
+    )
     if not task_by_agent.empty:
         # Sort agents by total descending
         agent_order = task_by_agent.groupby("Agent")["Total"].sum().sort_values(ascending=True).index.tolist()
-        fig_bar = px.bar(
-            task_by_agent, x="Total", y="Agent", color="Task",
-            orientation="h",
-            color_discrete_map=TASK_COLORS,
-            category_orders={"Agent": agent_order},
-        )
-        fig_bar.update_layout(
-            template="plotly_dark",
-            height=400,
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation="h", yanchor="bottom", y=-0.15),
-            xaxis_title="Total Engagement",
-            yaxis_title="",
-            barmode="stack",
-        )
+        def build_bar():
+            fig_bar = px.bar(
+                task_by_agent, x="Total", y="Agent", color="Task",
+                orientation="h",
+                color_discrete_map=TASK_COLORS,
+                category_orders={"Agent": agent_order},
+            )
+            fig_bar.update_layout(
+                template="plotly_dark",
+                height=400,
+                margin=dict(l=20, r=20, t=30, b=20),
+                legend=dict(orientation="h", yanchor="bottom", y=-0.15),
+                xaxis_title="Total Engagement",
+                yaxis_title="",
+                barmode="stack",
+            )
+            return fig_bar
+
+        fig_bar = cached_figure("tasks", "by_agent", (start_date, end_date), build_bar, ["task_daily"])
         st.plotly_chart(fig_bar, use_container_width=True)
 
 st.divider()
 
 # --- Row 2: Daily Trend ---
 st.markdown("### Daily Trend by Task")
-trend_data = get_task_daily_trend(df_task, start_date, end_date)
-if not trend_data.empty:
-    fig_trend = px.line(
-        trend_data, x="Date", y="Total", color="Task",
-        color_discrete_map=TASK_COLORS,
+
+
+@section("trend")
+def trend_section(df_task, start_date, end_date):
+    # The task filter lives in this fragment: changing it reruns only the trend.
+    task_options = ["All Tasks"] + depends_on(
+        "tasks_options", (), lambda: get_distinct_values(df_task, "Task"), ["task_daily"]
     )
-    fig_trend.update_layout(
-        template="plotly_dark",
-        height=350,
-        margin=dict(l=20, r=20, t=30, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02),
-        xaxis_title="", yaxis_title="Total Engagement",
+    selected_task = st.selectbox("Task Type", task_options, key="tasks_trend_task")
+    trend_data = depends_on(
+        "tasks_trend", (start_date, end_date, selected_task),
+        lambda: get_task_daily_trend(df_task, start_date, end_date, task_type=selected_task),
+        ["task_daily"],
     )
+    if trend_data.empty:
+        st.info("No data for this task in the selected range.")
+        return
+    resolution, window = detail_controls("task_trend", trend_data["Date"])
+    trend_data = apply_detail(trend_data, resolution, window, ["Total"], by="Task")
+    budget = None if resolution == "Daily" else CHART_POINT_BUDGET
+
+    def build_trend():
+        fig_trend = go.Figure()
+        for task, series in trend_data.groupby("Task", sort=False):
+            fig_trend.add_trace(line_trace(
+                series["Date"], series["Total"],
+                name=task, budget=budget, markers=False,
+                line=dict(color=TASK_COLORS.get(task)),
+            ))
+        fig_trend.update_layout(
+            template="plotly_dark",
+            height=350,
+            margin=dict(l=20, r=20, t=30, b=20),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02),
+            xaxis_title="", yaxis_title="Total Engagement",
+        )
+        return fig_trend
+
+    fig_trend = cached_figure("tasks", "daily_trend", (start_date, end_date, selected_task, resolution, window), build_trend, ["task_daily"])
     st.plotly_chart(fig_trend, use_container_width=True)
 
+
+trend_section(df_task, start_date, end_date)
+
 st.divider()
 
 # --- Row 3: Agent x Task Matrix ---
 st.markdown("### Agent x Task Matrix")
-matrix = get_task_agent_matrix(df_task, start_date, end_date)
+matrix = depends_on(
+    "tasks_matrix", (start_date, end_date),
+    lambda: get_task_agent_matrix(df_task, start_date, end_date), ["task_daily"],
+)
 if not matrix.empty:
-    # Format with commas
-    styled = matrix.style.format("{:,.0f}")
-    st.dataframe(styled, use_container_width=True, height=400)
+    render_table(matrix, height=400)
+    download_buttons("Matrix", matrix.reset_index(), f"task_matrix_{start_date}_{end_date}", "tasks_matrix")
+    download_buttons(
+        "Task rows", df_task, f"task_daily_{start_date}_{end_date}", "tasks_rows",
+        start_date=start_date, end_date=end_date,
+    )
 
     # Heatmap
     st.markdown("### Heatmap")
     heat_data = matrix.drop(columns=["Grand Total"], errors="ignore")
-    fig_heat = px.imshow(
-        heat_data,
-        color_continuous_scale="Blues",
-        aspect="auto",
-        text_auto=True,
-    )
-    fig_heat.update_layout(
-        template="plotly_dark",
-        height=max(300, len(heat_data) * 35 + 100),
-        margin=dict(l=20, r=20, t=30, b=20),
-        xaxis_title="Task", yaxis_title="Agent",
-    )
+    def build_heat():
+        fig_heat = px.imshow(
+            heat_data,
+            color_continuous_scale="Blues",
+            aspect="auto",
+            text_auto=True,
+        )
+        fig_heat.update_layout(
+            template="plotly_dark",
+            height=max(300, len(heat_data) * 35 + 100),
+            margin=dict(l=20, r=20, t=30, b=20),
+            xaxis_title="Task", yaxis_title="Agent",
+        )
+        return fig_heat
+
+    fig_heat = cached_figure("tasks", "agent_task_heatmap", (start_date, end_date), build_heat, ["task_daily"])
     st.plotly_chart(fig_heat, use_container_width=True)
+
+perf.finish_run()
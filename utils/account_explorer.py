@@ -0,0 +1,96 @@
+import numpy as np
+import streamlit as st
+
+from config.settings import TEAMS
+from utils.fragments import section
+from utils.sheets_connector import dataset_version, fetch_account_data
+
+SORT_COLUMNS = ["Username", "Agent", "Account Status", "Created Date"]
+PAGE_SIZES = [25, 50, 100]
+
+
+def build_account_index(df_accounts):
+    """Prebuilt lookup structures for server-side account queries.
+
+    Rows are stored sorted by lowercase username, so a username prefix is a
+    binary search; each sortable column keeps its own precomputed order.
+    """
+    keys = df_accounts["Username"].astype(str).str.lower()
+    frame = df_accounts.assign(_key=keys).sort_values("_key", kind="stable").reset_index(drop=True)
+    orders = {}
+    for col in SORT_COLUMNS:
+        sort_key = frame[col].astype(str).str.lower() if col != "Created Date" else frame[col]
+        orders[col] = np.argsort(sort_key.to_numpy(), kind="stable")
+    return {
+        "frame": frame.drop(columns="_key"),
+        "keys": frame["_key"].to_numpy(dtype=str),
+        "agent": frame["Agent"].to_numpy(dtype=str),
+        "status": frame["Account Status"].to_numpy(dtype=str),
+        "orders": orders,
+    }
+
+
+def match_accounts(index, agents=None, statuses=None, search="", sort_by="Username", ascending=True):
+    """Positions of the matching accounts in display order."""
+    n = len(index["keys"])
+    mask = np.ones(n, dtype=bool)
+    if agents is not None:
+        mask &= np.isin(index["agent"], list(agents))
+    if statuses is not None:
+        mask &= np.isin(index["status"], list(statuses))
+    prefix = search.strip().lower()
+    if prefix:
+        lo = np.searchsorted(index["keys"], prefix, side="left")
+        hi = np.searchsorted(index["keys"], prefix + "\uffff", side="left")
+        in_range = np.zeros(n, dtype=bool)
+        in_range[lo:hi] = True
+        mask &= in_range
+
+    order = index["orders"][sort_by]
+    if not ascending:
+        order = order[::-1]
+    return order[mask[order]]
+
+
+def account_page(index, rows, page, page_size):
+    start = (page - 1) * page_size
+    return index["frame"].iloc[rows[start:start + page_size]]
+
+
+@st.cache_resource(max_entries=2 * len(TEAMS))
+def _account_index(version):
+    return build_account_index(fetch_account_data())
+
+
+@section("account_explorer")
+def render_account_explorer(key, agents=None, statuses=None):
+    """Paginated account table; only the visible page is sent to the browser.
+
+    Runs as a fragment, so searching, sorting and paging rerun only the table.
+    """
+    df_accounts = fetch_account_data()
+    if df_accounts.empty:
+        st.info("No account data available.")
+        return
+    index = _account_index(dataset_version("account_data"))
+
+    c_search, c_sort, c_dir, c_size = st.columns([3, 2, 1, 1])
+    search = c_search.text_input("Search username", key=f"{key}_search", placeholder="Username starts with...")
+    sort_by = c_sort.selectbox("Sort by", SORT_COLUMNS, key=f"{key}_sort")
+    ascending = c_dir.selectbox("Order", ["Asc", "Desc"], key=f"{key}_dir") == "Asc"
+    page_size = c_size.selectbox("Rows", PAGE_SIZES, index=1, key=f"{key}_size")
+
+    rows = match_accounts(index, agents, statuses, search, sort_by, ascending)
+    total = len(rows)
+    pages = max(1, -(-total // page_size))
+    page = int(st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page"))
+    page = min(page, pages)
+    page_rows = account_page(index, rows, page, page_size)
+
+    first = (page - 1) * page_size + 1 if total else 0
+    last = first + len(page_rows) - 1 if total else 0
+    st.caption(f"Showing {first:,}-{last:,} of {total:,} accounts (page {page} of {pages})")
+    st.dataframe(
+        page_rows, use_container_width=True, hide_index=True,
+        column_config={"Created Date": st.column_config.DateColumn("Created Date", format="MMM DD, YYYY")},
+    )
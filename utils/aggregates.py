@@ -0,0 +1,188 @@
+"""Materialized aggregates in a SQLite file, rebuilt by a scheduled job.
+
+``python -m utils.aggregates`` runs the data_processor aggregations over the
+full history and atomically replaces AGGREGATES_DB. Pages read the small
+result tables instead of recomputing them, and fall back to live computation
+when the file is missing, older than AGGREGATES_MAX_AGE, or was built from
+different data than the page currently holds.
+
+The job is not in the default Procfile. To enable it, set AGGREGATES_DB to a
+file the web processes can read and add::
+
+    aggregates: python -m utils.aggregates
+"""
+import functools
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from config.settings import AGGREGATES_DB, AGGREGATES_MAX_AGE, AGGREGATES_REFRESH_SECONDS, SNAPSHOT_DIR
+from utils import snapshot
+from utils.data_processor import get_agent_rankings, get_weekly_agent_data, get_weekly_data, period_key
+from utils.perf import timed
+from utils.sheets_connector import dataset_version
+from utils.teams import current_team
+
+_INDEXES = {
+    "weekly": [("Year", "Week")],
+    "weekly_agents": [("Year", "Week", "Agent"), ("Agent",)],
+    "rankings": [("Kind", "Period", "Agent"), ("Agent",)],
+}
+_DATE_COLUMNS = {"weekly": ["Start", "End"]}
+
+
+def fingerprint(df):
+    """Content hash of a dataset: changes when any cell does, even if the totals don't."""
+    if df.empty:
+        return "empty"
+    return f"{len(df)}:{int(pd.util.hash_pandas_object(df, index=False).sum()):016x}"
+
+
+# (team, dataset) -> (dataset version, fingerprint) of the frame pages currently hold
+_fingerprints = {}
+
+
+def _loaded_fingerprint(name, df):
+    """fingerprint() of a dataset from the store, hashed once per loaded version."""
+    key = (current_team(), name)
+    version = dataset_version(name)
+    cached = _fingerprints.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, fingerprint(df))
+        _fingerprints[key] = cached
+    return cached[1]
+
+
+def _period_rankings(df_agent_daily, kind):
+    frames = []
+    for period, part in df_agent_daily.groupby(period_key(df_agent_daily["Date"], kind)):
+        rankings = get_agent_rankings(part, part["Date"].min(), part["Date"].max())
+        frames.append(rankings.reset_index().assign(Kind=kind, Period=period))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def build_tables(df_daily, df_agent_daily):
+    return {
+        "weekly": get_weekly_data(df_daily),
+        "weekly_agents": get_weekly_agent_data(df_agent_daily),
+        "rankings": pd.concat(
+            [_period_rankings(df_agent_daily, "week"), _period_rankings(df_agent_daily, "month")],
+            ignore_index=True,
+        ),
+    }
+
+
+def write_db(df_daily, df_agent_daily, path=AGGREGATES_DB):
+    """Build every table into a temporary file and swap it into place."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    with closing(sqlite3.connect(tmp)) as conn:
+        for name, table in build_tables(df_daily, df_agent_daily).items():
+            table.to_sql(name, conn, index=False)
+            for i, cols in enumerate(_INDEXES[name]):
+                columns = ", ".join(f'"{c}"' for c in cols)
+                conn.execute(f"CREATE INDEX {name}_{i} ON {name} ({columns})")
+        meta = pd.DataFrame([{
+            "built_at": time.time(),
+            "raw_daily": fingerprint(df_daily),
+            "raw_agent_daily": fingerprint(df_agent_daily),
+        }])
+        meta.to_sql("meta", conn, index=False)
+        conn.commit()
+    os.replace(tmp, path)
+
+
+def _query(sql, params=(), parse_dates=None):
+    with closing(sqlite3.connect(f"file:{AGGREGATES_DB}?mode=ro", uri=True)) as conn:
+        return pd.read_sql_query(sql, conn, params=params, parse_dates=parse_dates)
+
+
+@functools.lru_cache(maxsize=4)
+def _meta(mtime):
+    return _query("SELECT * FROM meta").iloc[0].to_dict()
+
+
+def _usable(**datasets):
+    """True when the aggregates file is fresh and was built from these frames."""
+    if not AGGREGATES_DB:
+        return False
+    try:
+        meta = _meta(os.path.getmtime(AGGREGATES_DB))
+    except (OSError, sqlite3.Error, pd.errors.DatabaseError):
+        return False
+    if time.time() - meta["built_at"] > AGGREGATES_MAX_AGE:
+        return False
+    return all(meta.get(name) == _loaded_fingerprint(name, df) for name, df in datasets.items())
+
+
+@functools.lru_cache(maxsize=16)
+def _table(name, mtime):
+    frame = _query(f"SELECT * FROM {name}", parse_dates=_DATE_COLUMNS.get(name))
+    if name == "weekly":
+        frame["Is_Complete"] = frame["Is_Complete"].astype(bool)
+    return frame
+
+
+@timed("process")
+def weekly_data(df_daily):
+    """get_weekly_data, served from the materialized table when it is current."""
+    if _usable(raw_daily=df_daily):
+        return _table("weekly", os.path.getmtime(AGGREGATES_DB)).copy(deep=False)
+    return get_weekly_data(df_daily)
+
+
+@timed("process")
+def weekly_agent_data(df_agent_daily):
+    """get_weekly_agent_data, served from the materialized table when it is current."""
+    if _usable(raw_agent_daily=df_agent_daily):
+        return _table("weekly_agents", os.path.getmtime(AGGREGATES_DB)).copy(deep=False)
+    return get_weekly_agent_data(df_agent_daily)
+
+
+@timed("process")
+def period_rankings(df_agent_daily, kind, period, start_date, end_date):
+    """Agent rankings for one week ("YYYY-Www") or month ("YYYY-MM").
+
+    Reads only that period's rows from the materialized table; otherwise
+    computes them live for start_date..end_date.
+    """
+    if _usable(raw_agent_daily=df_agent_daily):
+        rankings = _query(
+            'SELECT * FROM rankings WHERE "Kind" = ? AND "Period" = ? ORDER BY "Rank"', (kind, period)
+        )
+        return rankings.drop(columns=["Kind", "Period"]).set_index("Rank")
+    return get_agent_rankings(df_agent_daily, start_date, end_date)
+
+
+def run_job(interval=AGGREGATES_REFRESH_SECONDS, once=False):
+    from utils.sheets_connector import load_live_datasets
+
+    names = ("raw_daily", "raw_agent_daily")
+    while True:
+        started = time.time()
+        try:
+            version = snapshot.current_version() if SNAPSHOT_DIR else None
+            if version is not None:
+                sources = {n: snapshot.read_dataset(n, version) for n in names}
+            else:
+                sources = load_live_datasets(*names)
+            write_db(sources["raw_daily"], sources["raw_agent_daily"])
+            print(f"aggregates written to {AGGREGATES_DB} in {time.time() - started:.1f}s", flush=True)
+        except Exception as exc:
+            print(f"aggregate rebuild failed: {exc!r}", file=sys.stderr, flush=True)
+            if once:
+                return 1
+        if once:
+            return 0
+        time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    if not AGGREGATES_DB:
+        sys.exit("Set AGGREGATES_DB to the SQLite file the dashboard reads.")
+    sys.exit(run_job(once="--once" in sys.argv[1:]))
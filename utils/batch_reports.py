@@ -0,0 +1,260 @@
+"""Render the dashboard reports to static HTML/CSV/PNG files without Streamlit.
+
+``python -m utils.batch_reports --out reports`` writes a daily report for each
+of the last ``--days`` days, one per ISO week and per month, and one per agent
+for ``--agent-month`` (default: the latest month). Reports run in a process
+pool; every worker memory-maps the same Arrow snapshot, so the data is loaded
+from Sheets once and shared through the OS page cache.
+"""
+import argparse
+import html
+import importlib.util
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import plotly.express as px
+
+from config.settings import ENGAGEMENT_TYPES, METRIC_COLORS, SNAPSHOT_DIR
+from utils import snapshot
+from utils.data_processor import (
+    filter_by_agent, filter_by_date, get_agent_profiles, get_agent_rankings, get_daily_summary,
+    get_day_comparison, get_task_distribution, get_weekly_data,
+)
+
+DATASETS = ["raw_daily", "raw_agent_daily", "task_daily"]
+
+_data = {}
+_out_dir = ""
+_formats = ()
+
+
+def _init_worker(snapshot_dir, version, out_dir, formats):
+    global _out_dir, _formats
+    for name in DATASETS:
+        _data[name] = snapshot.read_dataset(name, version, snapshot_dir)
+    _out_dir = out_dir
+    _formats = formats
+
+
+def _has_row_labels(df):
+    """False when the index only numbers the rows (unnamed integers), so files leave it out."""
+    return df.index.name is not None or not pd.api.types.is_integer_dtype(df.index)
+
+
+def _path_part(name):
+    """``name`` made safe as one path component: no separators, no leading dots."""
+    return re.sub(r"[^\w .-]", "_", str(name)).strip().lstrip(".") or "_"
+
+
+def _summary_table(summary):
+    return pd.DataFrame({"Metric": list(summary), "Value": list(summary.values())})
+
+
+def _trend_figure(df, title):
+    fig = px.bar(df, x="Date", y=ENGAGEMENT_TYPES, color_discrete_map=METRIC_COLORS, title=title)
+    fig.update_layout(template="plotly_dark", height=400, legend_title_text="", xaxis_title="", yaxis_title="")
+    return fig
+
+
+def _rankings_figure(rankings, title):
+    fig = px.bar(rankings, x="Agent", y="Total", title=title, color_discrete_sequence=[METRIC_COLORS["Total"]])
+    fig.update_layout(template="plotly_dark", height=400, xaxis_title="", yaxis_title="")
+    return fig
+
+
+def _daily_report(date):
+    date = pd.Timestamp(date)
+    today, prev, deltas = get_day_comparison(_data["raw_daily"], date)
+    comparison = pd.DataFrame({"Today": today, "Previous Day": prev, "Change": deltas}).rename_axis("Metric")
+    rankings = get_agent_rankings(_data["raw_agent_daily"], date, date)
+    figures = {"agent_breakdown": lambda: _rankings_figure(rankings, "Agent Breakdown")} if not rankings.empty else {}
+    return (
+        f"Daily Report - {date:%B %d, %Y}",
+        {"comparison": comparison, "agent_rankings": rankings},
+        figures,
+    )
+
+
+def _period_report(title, start, end):
+    daily, summary = get_daily_summary(_data["raw_daily"], start, end)
+    rankings = get_agent_rankings(_data["raw_agent_daily"], start, end)
+    tasks = get_task_distribution(_data["task_daily"], start, end)
+    figures = {}
+    if not daily.empty:
+        figures["daily_trend"] = lambda: _trend_figure(daily, "Daily Engagement")
+    if not rankings.empty:
+        figures["agent_rankings"] = lambda: _rankings_figure(rankings, "Agent Rankings")
+    if not tasks.empty:
+        figures["task_distribution"] = lambda: px.pie(
+            tasks, values="Total", names="Task", hole=0.5, title="Task Distribution",
+        ).update_layout(template="plotly_dark", height=400)
+    tables = {"summary": _summary_table(summary), "agent_rankings": rankings, "task_distribution": tasks}
+    return f"{title} ({start:%b %d, %Y} - {end:%b %d, %Y})", tables, figures
+
+
+def _weekly_report(start, end):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    return _period_report(f"Weekly Report - W{start.isocalendar().week}", start, end)
+
+
+def _monthly_report(start, end):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    return _period_report(f"Monthly Report - {start:%B %Y}", start, end)
+
+
+def _agent_report(agent, start, end):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    profiles = get_agent_profiles(_data["raw_agent_daily"], start, end)
+    profile = (
+        profiles.loc[[agent]].T.rename(columns={agent: "Value"}).rename_axis("Metric")
+        if agent in profiles.index else pd.DataFrame()
+    )
+    daily = filter_by_date(filter_by_agent(_data["raw_agent_daily"], agent), start, end)
+    tasks = get_task_distribution(filter_by_agent(_data["task_daily"], agent), start, end)
+    figures = {"daily_trend": lambda: _trend_figure(daily, "Daily Engagement")} if not daily.empty else {}
+    tables = {"profile": profile, "daily": daily, "task_distribution": tasks}
+    return f"{agent} - {start:%B %Y}", tables, figures
+
+
+_REPORTS = {
+    "daily": _daily_report,
+    "weekly": _weekly_report,
+    "monthly": _monthly_report,
+    "agent": _agent_report,
+}
+
+
+def _write_html(path, title, tables, figures):
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif;background:#0e1117;color:#fafafa;margin:2em}"
+        "table{border-collapse:collapse;margin-bottom:2em}td,th{border:1px solid #333;padding:4px 8px;text-align:right}"
+        "</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+    ]
+    first = True
+    for fig in figures.values():
+        parts.append(fig.to_html(full_html=False, include_plotlyjs="cdn" if first else False))
+        first = False
+    for name, df in tables.items():
+        if df.empty:
+            continue
+        parts.append(f"<h2>{html.escape(name.replace('_', ' ').title())}</h2>")
+        parts.append(df.to_html(index=_has_row_labels(df), float_format=lambda v: f"{v:,.1f}", border=0))
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+def run_report(kind, label, args):
+    """Build one report in a worker and write its files; returns the report directory.
+
+    Report functions return figure builders, so CSV-only runs never touch Plotly.
+    """
+    title, tables, builders = _REPORTS[kind](*args)
+    figures = {name: build() for name, build in builders.items()} if {"html", "png"} & set(_formats) else {}
+    target = os.path.join(_out_dir, kind, label)
+    os.makedirs(target, exist_ok=True)
+    if "csv" in _formats:
+        for name, df in tables.items():
+            df.to_csv(os.path.join(target, f"{name}.csv"), index=_has_row_labels(df))
+    if "html" in _formats:
+        _write_html(os.path.join(target, "report.html"), title, tables, figures)
+    if "png" in _formats:
+        for name, fig in figures.items():
+            fig.write_image(os.path.join(target, f"{name}.png"), width=1200, height=500)
+    return target
+
+
+def plan_jobs(data, days, agent_month=None):
+    """(kind, label, args) for every report to produce."""
+    daily = data["raw_daily"]
+    jobs = []
+    if daily.empty:
+        return jobs
+    for date in sorted(daily["Date"].unique())[-days:]:
+        date = pd.Timestamp(date)
+        jobs.append(("daily", f"{date:%Y-%m-%d}", (date,)))
+    for _, week in get_weekly_data(daily).iterrows():
+        jobs.append(("weekly", f"{week['Year']}-W{week['Week']:02d}", (week["Start"], week["End"])))
+
+    months = daily["Date"].dt.to_period("M")
+    for month in sorted(months.unique()):
+        jobs.append(("monthly", str(month), (month.start_time, month.end_time.normalize())))
+
+    month = pd.Period(agent_month, "M") if agent_month else months.max()
+    for agent in sorted(data["raw_agent_daily"]["Agent"].unique()):
+        jobs.append(("agent", f"{month}/{_path_part(agent)}", (agent, month.start_time, month.end_time.normalize())))
+    return jobs
+
+
+def _snapshot_source(snapshot_dir, scratch):
+    """(directory, version) of the snapshot to read, writing one from Sheets if needed."""
+    version = snapshot.current_version(snapshot_dir) if snapshot_dir else None
+    if version is not None:
+        return snapshot_dir, version
+    from utils.sheets_connector import load_live_datasets
+
+    print("no snapshot found, loading from Google Sheets...", flush=True)
+    return scratch, snapshot.write_snapshot(load_live_datasets(), scratch)
+
+
+def _write_index(out_dir, written):
+    rows = "\n".join(
+        f"<li><a href='{html.escape(os.path.relpath(path, out_dir))}/report.html'>"
+        f"{html.escape(os.path.relpath(path, out_dir))}</a></li>"
+        for path in sorted(written)
+    )
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Reports</title></head>"
+                f"<body><h1>Reports</h1><ul>{rows}</ul></body></html>")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="reports", help="output directory")
+    parser.add_argument("--formats", default="html,csv", help="comma-separated: html, csv, png (png needs kaleido)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="report processes")
+    parser.add_argument("--days", type=int, default=7, help="daily reports for the last N days")
+    parser.add_argument("--agent-month", help="YYYY-MM for the per-agent reports (default: latest month)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="read an existing snapshot instead of Sheets")
+    args = parser.parse_args(argv)
+
+    formats = tuple(f.strip() for f in args.formats.split(",") if f.strip())
+    if "png" in formats and importlib.util.find_spec("kaleido") is None:
+        print("kaleido is not installed; skipping PNG output", file=sys.stderr)
+        formats = tuple(f for f in formats if f != "png")
+
+    started = time.time()
+    with tempfile.TemporaryDirectory() as scratch:
+        snapshot_dir, version = _snapshot_source(args.snapshot_dir, scratch)
+        _init_worker(snapshot_dir, version, args.out, formats)
+        jobs = plan_jobs(_data, args.days, args.agent_month)
+
+        written, failed = [], 0
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init_worker,
+            initargs=(snapshot_dir, version, args.out, formats),
+        ) as pool:
+            futures = {pool.submit(run_report, kind, label, job_args): (kind, label) for kind, label, job_args in jobs}
+            for future in as_completed(futures):
+                try:
+                    written.append(future.result())
+                except Exception as exc:
+                    failed += 1
+                    print(f"{'/'.join(futures[future])} failed: {exc!r}", file=sys.stderr, flush=True)
+
+    if "html" in formats:
+        _write_index(args.out, written)
+    print(f"{len(written)} reports written to {args.out} in {time.time() - started:.1f}s ({failed} failed)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Start the dashboard with warm caches.
+
+``python -m utils.boot [streamlit options]`` loads every team's datasets into
+the process-wide stores and imports the chart libraries, then starts
+``streamlit run app.py`` in the same process, so the first visitor after a
+deploy is served from memory instead of waiting on Sheets.
+"""
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import TEAMS
+from utils import lazy
+from utils.sheets_connector import get_dataset_store
+
+logger = logging.getLogger("booster.boot")
+
+
+def warm():
+    """Load every team's datasets concurrently; returns the seconds it took."""
+    started = time.perf_counter()
+    stores = {team: get_dataset_store(team) for team in TEAMS}
+    jobs = [(team, name) for team, store in stores.items() for name in store.names()]
+    with ThreadPoolExecutor(max_workers=min(len(jobs), 12)) as pool:
+        futures = {job: pool.submit(stores[job[0]].get, job[1]) for job in jobs}
+        lazy.px.load()
+    for (team, name), future in futures.items():
+        try:
+            future.result()
+        except Exception as exc:
+            # Leave it to the first page that needs it; the store retries on demand.
+            logger.warning("warmup of %s/%s failed: %s", team, name, exc)
+    return time.perf_counter() - started
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger.info("warmed caches in %.2fs", warm())
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", "app.py", *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
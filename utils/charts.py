@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from config.settings import CHART_POINT_BUDGET, CHART_WEBGL_THRESHOLD
+
+RESOLUTIONS = ["Auto", "Daily", "Weekly", "Monthly"]
+_ROLLUP_FREQ = {"Weekly": "W-MON", "Monthly": "MS"}
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the shape of y."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = np.empty(n_out, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(area.argmax())
+        picked[i + 1] = prev
+    return picked
+
+
+def line_trace(x, y, name, line, marker=None, budget=CHART_POINT_BUDGET, markers=True):
+    """Scatter trace downsampled to ``budget`` points, switching to WebGL when large.
+
+    Pass ``budget=None`` to keep every point.
+    """
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    if budget and len(y) > budget:
+        x_num = x.astype("int64") if pd.api.types.is_datetime64_any_dtype(x) else x
+        idx = lttb_indices(x_num, y, budget)
+        x, y = x.iloc[idx], y.iloc[idx]
+    trace_cls = go.Scattergl if len(y) > CHART_WEBGL_THRESHOLD else go.Scatter
+    mode = "lines+markers" if markers and len(y) <= CHART_WEBGL_THRESHOLD else "lines"
+    return trace_cls(x=x, y=y, name=name, mode=mode, line=line, marker=marker)
+
+
+def auto_resolution(n_points, budget=CHART_POINT_BUDGET):
+    """Coarsest rollup needed to bring a daily series under the point budget."""
+    if n_points <= budget:
+        return "Daily"
+    if n_points <= budget * 7:
+        return "Weekly"
+    return "Monthly"
+
+
+def apply_detail(df, resolution, window, value_cols, by=None):
+    """Restrict df to the zoom window and roll it up to the chosen resolution."""
+    if window is not None:
+        start, end = window
+        df = df[(df["Date"] >= pd.Timestamp(start)) & (df["Date"] <= pd.Timestamp(end))]
+    if resolution not in _ROLLUP_FREQ:
+        return df
+    keys = [pd.Grouper(key="Date", freq=_ROLLUP_FREQ[resolution], label="left", closed="left")]
+    if by:
+        keys.append(by)
+    rolled = df.groupby(keys)[value_cols].sum().reset_index()
+    if by:
+        # Drop periods a series had no rows in, so they don't plot as zeros.
+        present = df.groupby(keys).size().reset_index(name="_rows")
+        rolled = rolled[present["_rows"].to_numpy() > 0]
+    return rolled
+
+
+def detail_controls(key, dates):
+    """Resolution and zoom-window widgets for a long trend chart.
+
+    Zooming narrows the window, so Auto mode returns to full daily detail
+    once the visible range fits in the point budget.
+    """
+    dates = pd.Series(pd.to_datetime(dates)).dropna()
+    with st.expander("Chart detail"):
+        resolution = st.radio("Resolution", RESOLUTIONS, horizontal=True, key=f"{key}_resolution")
+        first, last = dates.min().date(), dates.max().date()
+        if first < last:
+            window = st.slider(
+                "Zoom", min_value=first, max_value=last, value=(first, last),
+                format="MMM DD, YYYY", key=f"{key}_zoom",
+            )
+        else:
+            window = (first, last)
+    return resolution, window
+
+
+def rank_bump(history, highlight=None):
+    """Bump chart of a get_rank_history table: one line per agent, rank 1 at the top.
+
+    With ``highlight``, that agent is drawn bold and the others greyed out.
+    """
+    fig = go.Figure()
+    for agent, part in history.groupby("Agent", sort=False):
+        if highlight is None:
+            line, marker, legend = dict(width=2), dict(size=6), True
+        else:
+            selected = agent == highlight
+            line = dict(width=4 if selected else 1, color="#4F8BF9" if selected else "rgba(150,150,150,0.35)")
+            marker, legend = dict(size=8 if selected else 4), selected
+        fig.add_trace(go.Scatter(
+            x=part["Period"], y=part["Rank"], name=agent, mode="lines+markers",
+            line=line, marker=marker, showlegend=legend,
+        ))
+    fig.update_layout(
+        template="plotly_dark", height=400,
+        margin=dict(l=20, r=20, t=30, b=20),
+        xaxis_title="", yaxis_title="Rank",
+        yaxis=dict(autorange="reversed", dtick=1),
+        hovermode="closest",
+    )
+    return fig
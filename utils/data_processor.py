@@ -1,18 +1,39 @@
+import numpy as np
 import pandas as pd
 from config.settings import ENGAGEMENT_TYPES
+from utils.perf import timed
+from utils.sql_backend import SqlDataset
+
+
+def _grouped_sums(df, keys, columns, start_date, end_date, **equals):
+    """Sum columns by keys over the date range; runs as one query on a SqlDataset."""
+    if isinstance(df, SqlDataset):
+        return df.sum_by(keys, columns, start_date, end_date, **equals)
+    filtered = filter_by_date(df, start_date, end_date)
+    for column, value in equals.items():
+        if value is not None:
+            filtered = filtered[filtered[column] == value]
+    if filtered.empty:
+        return pd.DataFrame()
+    return filtered.groupby(keys)[columns].sum().reset_index()
 
 
 def filter_by_date(df, start_date, end_date):
+    if isinstance(df, SqlDataset):
+        return df.select(start_date, end_date)
     mask = (df["Date"] >= pd.Timestamp(start_date)) & (df["Date"] <= pd.Timestamp(end_date))
-    return df[mask].copy()
+    return df[mask]
 
 
 def filter_by_agent(df, agent):
+    if isinstance(df, SqlDataset):
+        return df.select(Agent=agent if agent and agent != "All Agents" else None)
     if agent and agent != "All Agents":
-        return df[df["Agent"] == agent].copy()
-    return df.copy()
+        return df[df["Agent"] == agent]
+    return df.copy(deep=False)
 
 
+@timed("process")
 def get_daily_summary(df_daily, start_date, end_date):
     filtered = filter_by_date(df_daily, start_date, end_date)
     if filtered.empty:
@@ -36,16 +57,22 @@ def get_daily_summary(df_daily, start_date, end_date):
     return filtered, summary
 
 
+@timed("process")
 def get_agent_rankings(df_agent_daily, start_date, end_date):
-    filtered = filter_by_date(df_agent_daily, start_date, end_date)
-    if filtered.empty:
+    metrics = ENGAGEMENT_TYPES + ["Total"]
+    if isinstance(df_agent_daily, SqlDataset):
+        grouped = df_agent_daily.sum_by(["Agent"], metrics, start_date, end_date)
+        days = df_agent_daily.count_distinct("Date", start_date, end_date)
+    else:
+        filtered = filter_by_date(df_agent_daily, start_date, end_date)
+        grouped = filtered.groupby("Agent")[metrics].sum().reset_index()
+        days = filtered["Date"].nunique()
+    if grouped.empty:
         return pd.DataFrame()
 
-    grouped = filtered.groupby("Agent")[ENGAGEMENT_TYPES + ["Total"]].sum().reset_index()
     grand_total = grouped["Total"].sum()
     grouped["% Contribution"] = (grouped["Total"] / grand_total * 100).round(1) if grand_total > 0 else 0
 
-    days = filtered["Date"].nunique()
     grouped["Avg/Day"] = (grouped["Total"] / days).round(0).astype(int) if days > 0 else 0
     grouped = grouped.sort_values("Total", ascending=False).reset_index(drop=True)
     grouped.index = grouped.index + 1
@@ -53,12 +80,59 @@ def get_agent_rankings(df_agent_daily, start_date, end_date):
     return grouped
 
 
+@timed("process")
+def get_agent_profiles(df_agent_daily, start_date, end_date, stats=None):
+    """Per-agent totals, active days, avg/day, consistency and rank, indexed by Agent.
+    Consistency is 100 minus the coefficient of variation over active days.
+    With ``stats`` (a utils.rolling.RollingStats) the active-day moments are read
+    from its prefix sums instead of being recomputed over the range."""
+    filtered = filter_by_date(df_agent_daily, start_date, end_date)
+    if filtered.empty:
+        return pd.DataFrame()
+
+    metrics = ENGAGEMENT_TYPES + ["Total"]
+    profiles = filtered.groupby("Agent")[metrics].sum()
+    profiles["Total Days"] = filtered.groupby("Agent").size()
+
+    if stats is None:
+        active = filtered.loc[filtered["Total"] > 0, ["Agent", "Total"]]
+        active_stats = active.groupby("Agent")["Total"].agg(["count", "mean", "std"])
+        days_active = active_stats["count"]
+        cv = active_stats["std"] / active_stats["mean"] * 100
+    else:
+        table = stats.range_table(start_date, end_date)
+        days_active, cv = table["Active Days"], table["CV"]
+    profiles["Days Active"] = days_active.reindex(profiles.index, fill_value=0).astype(int)
+    profiles["Avg/Day"] = (
+        profiles["Total"] // profiles["Days Active"].where(profiles["Days Active"] > 0)
+    ).fillna(0).astype(int)
+
+    cv = cv.reindex(profiles.index)
+    consistency = (100 - cv).clip(lower=0).round(1)
+    profiles["Consistency"] = consistency.where(profiles["Days Active"] > 1, 100.0)
+
+    grand_total = profiles["Total"].sum()
+    profiles["% Contribution"] = (profiles["Total"] / grand_total * 100).round(1) if grand_total > 0 else 0.0
+    profiles = profiles.sort_values("Total", ascending=False)
+    profiles["Rank"] = range(1, len(profiles) + 1)
+    return profiles
+
+
+def get_consistency_leaderboard(profiles, min_active_days=2):
+    """Agents ordered by consistency score, from a get_agent_profiles table."""
+    if profiles.empty:
+        return pd.DataFrame()
+    board = profiles[profiles["Days Active"] >= min_active_days]
+    board = board[["Consistency", "Days Active", "Avg/Day", "Total", "Rank"]]
+    return board.sort_values(["Consistency", "Total"], ascending=False)
+
+
+@timed("process")
 def get_weekly_data(df_daily):
     if df_daily.empty:
         return pd.DataFrame()
-    df = df_daily.copy()
-    df["Week"] = df["Date"].dt.isocalendar().week.astype(int)
-    df["Year"] = df["Date"].dt.isocalendar().year.astype(int)
+    iso = df_daily["Date"].dt.isocalendar()
+    df = df_daily.assign(Week=iso.week.astype(int), Year=iso.year.astype(int))
     weekly = df.groupby(["Year", "Week"]).agg(
         Comments=("Comments", "sum"),
         Reactions=("Reactions", "sum"),
@@ -83,16 +157,125 @@ def get_weekly_data(df_daily):
     return weekly.sort_values(["Year", "Week"]).reset_index(drop=True)
 
 
+@timed("process")
 def get_weekly_agent_data(df_agent_daily):
     if df_agent_daily.empty:
         return pd.DataFrame()
-    df = df_agent_daily.copy()
-    df["Week"] = df["Date"].dt.isocalendar().week.astype(int)
-    df["Year"] = df["Date"].dt.isocalendar().year.astype(int)
+    iso = df_agent_daily["Date"].dt.isocalendar()
+    df = df_agent_daily.assign(Week=iso.week.astype(int), Year=iso.year.astype(int))
     weekly = df.groupby(["Year", "Week", "Agent"])[ENGAGEMENT_TYPES + ["Total"]].sum().reset_index()
     return weekly
 
 
+def period_key(dates, kind):
+    """Period label per date: "YYYY-MM-DD" (day), "YYYY-Www" (ISO week) or "YYYY-MM" (month)."""
+    if kind == "day":
+        return dates.dt.strftime("%Y-%m-%d")
+    if kind == "week":
+        iso = dates.dt.isocalendar()
+        return iso.year.astype(str) + "-W" + iso.week.astype(str).str.zfill(2)
+    return dates.dt.to_period("M").astype(str)
+
+
+_PERIOD_FREQ = {"day": "D", "week": "W-SUN", "month": "M"}
+
+
+def _calendar_periods(dates, kind):
+    """period_key labels of every calendar period from the first date to the last, gaps included."""
+    span = pd.period_range(dates.min(), dates.max(), freq=_PERIOD_FREQ[kind])
+    return period_key(pd.Series(span.start_time), kind).tolist()
+
+
+@timed("process")
+def get_period_comparison(df, periods, by=None, metrics=None):
+    """Each period's metrics against the period before it, from one grouped pass.
+
+    ``periods`` is "day", "week" or "month" to compare every period present in
+    ``df`` with the previous calendar period (0 when it has no rows), or a (start, end) pair to compare that range
+    with the equal-length range just before it (labelled "Current"). ``by``
+    (e.g. "Agent") splits every period per group; groups absent from a period
+    count as 0 there.
+
+    Returns Period, the ``by`` column, Days (dates present in the period) and,
+    per metric, the value, Prev_<metric>, Delta_<metric> and Growth_<metric> (% of
+    the previous value; NaN when that is 0 or there is no previous period).
+    """
+    metrics = metrics or ENGAGEMENT_TYPES + ["Total"]
+    keys = [by] if by else []
+    if isinstance(periods, str):
+        data = df
+        labels = period_key(df["Date"], periods)
+    else:
+        start, end = pd.Timestamp(periods[0]), pd.Timestamp(periods[1])
+        prior_start = start - (end - start) - pd.Timedelta(days=1)
+        data = filter_by_date(df, prior_start, end)
+        labels = pd.Series(np.where(data["Date"] >= start, "Current", "Prior"), index=data.index)
+    columns = ["Period"] + keys + ["Days"] + [c for m in metrics for c in (m, f"Prev_{m}", f"Delta_{m}", f"Growth_{m}")]
+    if data.empty:
+        return pd.DataFrame(columns=columns)
+
+    labels = labels.rename("Period")
+    sums = data.groupby([labels] + [data[k] for k in keys])[metrics].sum()
+    days = data.groupby(labels)["Date"].nunique()
+    order = ["Prior", "Current"] if not isinstance(periods, str) else _calendar_periods(data["Date"], periods)
+    if keys:
+        sums = sums.unstack(keys, fill_value=0).reindex(order, fill_value=0)
+        current = sums.stack(keys, future_stack=True)
+        previous = sums.shift(1).stack(keys, future_stack=True)
+    else:
+        current = sums.reindex(order, fill_value=0)
+        previous = current.shift(1)
+
+    result = current.copy()
+    for m in metrics:
+        prev = previous[m]
+        result[f"Prev_{m}"] = prev
+        result[f"Delta_{m}"] = current[m] - prev
+        result[f"Growth_{m}"] = ((current[m] - prev) / prev.where(prev > 0) * 100).round(1)
+    result = result.reset_index()
+    result["Days"] = result["Period"].map(days).fillna(0).astype(int)
+    # Only the compared periods: gaps were filled in just to be the previous period.
+    result = result[result["Period"] == "Current"] if not isinstance(periods, str) else result[result["Days"] > 0]
+    return result[columns].reset_index(drop=True)
+
+
+@timed("process")
+def get_rank_history(df_agent_daily, kind="week", metric="Total"):
+    """Dense rank of every agent in every period, from one grouped rank pass.
+
+    Returns Period, Agent, the metric, Rank (1 = highest) and Change: places
+    gained since the agent's previous ranked period (positive = moved up).
+    """
+    if df_agent_daily.empty:
+        return pd.DataFrame(columns=["Period", "Agent", metric, "Rank", "Change"])
+    labels = period_key(df_agent_daily["Date"], kind).rename("Period")
+    sums = df_agent_daily.groupby([labels, df_agent_daily["Agent"]])[metric].sum()
+    history = sums.reset_index()
+    history["Rank"] = sums.groupby(level="Period").rank(method="dense", ascending=False).astype(int).to_numpy()
+    history["Change"] = -history.groupby("Agent")["Rank"].diff()
+    return history
+
+
+@timed("process")
+def get_rank_summary(history):
+    """Best, worst, average and latest rank per agent, plus volatility
+    (mean places moved between consecutive ranked periods), from get_rank_history."""
+    if history.empty:
+        return pd.DataFrame()
+    by_agent = history.groupby("Agent")
+    summary = pd.DataFrame({
+        "Periods": by_agent.size(),
+        "Best Rank": by_agent["Rank"].min(),
+        "Worst Rank": by_agent["Rank"].max(),
+        "Avg Rank": by_agent["Rank"].mean().round(1),
+        "Latest Rank": by_agent["Rank"].last(),
+        "Volatility": history["Change"].abs().groupby(history["Agent"]).mean().round(2),
+    })
+    summary["Volatility"] = summary["Volatility"].fillna(0.0)
+    return summary.sort_values(["Avg Rank", "Best Rank"])
+
+
+@timed("process")
 def get_day_comparison(df_daily, target_date):
     """Get metrics for target_date and previous day, with deltas."""
     df = df_daily.sort_values("Date")
@@ -118,49 +301,60 @@ def get_day_comparison(df_daily, target_date):
     return today_metrics, prev_metrics, deltas
 
 
+@timed("process")
 def get_task_distribution(df_task, start_date, end_date):
     """Overall task distribution for pie chart."""
-    filtered = filter_by_date(df_task, start_date, end_date)
-    if filtered.empty:
+    grouped = _grouped_sums(df_task, ["Task"], ["Comments", "Reactions", "Shares", "Total"], start_date, end_date)
+    if grouped.empty:
         return pd.DataFrame()
-    grouped = filtered.groupby("Task")[["Comments", "Reactions", "Shares", "Total"]].sum().reset_index()
     grouped = grouped.sort_values("Total", ascending=False).reset_index(drop=True)
     grand_total = grouped["Total"].sum()
     grouped["% of Total"] = (grouped["Total"] / grand_total * 100).round(1) if grand_total > 0 else 0
     return grouped
 
 
+@timed("process")
 def get_task_by_agent(df_task, start_date, end_date):
     """Task breakdown per agent - stacked bar data."""
-    filtered = filter_by_date(df_task, start_date, end_date)
-    if filtered.empty:
-        return pd.DataFrame()
-    grouped = filtered.groupby(["Agent", "Task"])["Total"].sum().reset_index()
-    return grouped
+    return _grouped_sums(df_task, ["Agent", "Task"], ["Total"], start_date, end_date)
 
 
+@timed("process")
 def get_task_daily_trend(df_task, start_date, end_date, task_type=None):
     """Daily trend for a specific task or all tasks."""
-    filtered = filter_by_date(df_task, start_date, end_date)
-    if filtered.empty:
-        return pd.DataFrame()
-    if task_type and task_type != "All Tasks":
-        filtered = filtered[filtered["Task"] == task_type]
-    grouped = filtered.groupby(["Date", "Task"])["Total"].sum().reset_index()
-    return grouped
+    task = task_type if task_type and task_type != "All Tasks" else None
+    return _grouped_sums(df_task, ["Date", "Task"], ["Total"], start_date, end_date, Task=task)
 
 
+@timed("process")
 def get_task_agent_matrix(df_task, start_date, end_date):
     """Agent x Task matrix (pivot table)."""
-    filtered = filter_by_date(df_task, start_date, end_date)
-    if filtered.empty:
+    grouped = _grouped_sums(df_task, ["Agent", "Task"], ["Total"], start_date, end_date)
+    if grouped.empty:
         return pd.DataFrame()
-    pivot = filtered.groupby(["Agent", "Task"])["Total"].sum().unstack(fill_value=0)
+    pivot = grouped.set_index(["Agent", "Task"])["Total"].unstack(fill_value=0)
     pivot["Grand Total"] = pivot.sum(axis=1)
     pivot = pivot.sort_values("Grand Total", ascending=False)
     return pivot
 
 
+@timed("process")
+def get_available_dates(df):
+    """Sorted distinct dates (as datetime.date) present in a dataset."""
+    if isinstance(df, SqlDataset):
+        return [d.date() for d in pd.to_datetime(df.distinct("Date"))]
+    return sorted(df["Date"].dt.date.unique())
+
+
+@timed("process")
+def get_distinct_values(df, column):
+    """Sorted distinct non-null values of a dataset column."""
+    if isinstance(df, SqlDataset):
+        return df.distinct(column)
+    return sorted(df[column].dropna().unique().tolist())
+
+
+@timed("process")
 def get_account_summary(df_accounts):
     """Overall account status summary."""
     if df_accounts.empty:
@@ -176,6 +370,7 @@ def get_account_summary(df_accounts):
     }
 
 
+@timed("process")
 def get_account_by_agent(df_accounts):
     """Account breakdown per agent."""
     if df_accounts.empty:
@@ -190,11 +385,27 @@ def get_account_by_agent(df_accounts):
     return pivot.sort_values("Total", ascending=False)
 
 
+@timed("process")
 def get_account_creation_timeline(df_accounts):
     """Monthly account creation counts."""
     if df_accounts.empty:
         return pd.DataFrame()
-    df = df_accounts.dropna(subset=["Created Date"]).copy()
-    df["Month"] = df["Created Date"].dt.to_period("M").astype(str)
+    df = df_accounts.dropna(subset=["Created Date"])
+    df = df.assign(Month=df["Created Date"].dt.to_period("M").astype(str))
     timeline = df.groupby(["Month", "Agent"]).size().reset_index(name="Count")
     return timeline
+
+
+def status_labels(totals, threshold):
+    """'Above Avg' / 'Below Avg' for each total against a threshold."""
+    return pd.Series(
+        np.select([totals >= threshold], ["Above Avg"], default="Below Avg"), index=totals.index
+    )
+
+
+def health_labels(active_pct):
+    """Account health bucket for each Active % value."""
+    return pd.Series(
+        np.select([active_pct >= 80, active_pct >= 60], ["Healthy", "Fair"], default="At Risk"),
+        index=active_pct.index,
+    )
@@ -0,0 +1,221 @@
+"""Process-wide store of the loaded datasets, shared read-only by every session.
+
+``python -m utils.dataset_store [rows]`` profiles what a cached read costs:
+an st.cache_data hit (a pickle round trip of the frame) against a store view.
+"""
+import functools
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.memory_budget import nbytes
+
+
+class _Entry:
+    __slots__ = ("value", "size", "loaded_at", "fetched_at", "version", "token")
+
+    def __init__(self, value, loaded_at, version, token=None):
+        self.value = value
+        self.size = nbytes(value)  # measured once: deep=True scans every object column
+        self.loaded_at = loaded_at  # start of the current TTL (moved forward by unchanged probes)
+        self.fetched_at = loaded_at
+        self.version = version
+        self.token = token
+
+
+def _view(value):
+    """Hand out a zero-copy view of a shared value."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def _freeze(value):
+    """Make a loaded value immutable: lists become tuples, frame buffers read-only.
+
+    Writing into a frozen frame's arrays, directly or through any view of it,
+    raises ValueError("assignment destination is read-only").
+    """
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, pd.DataFrame):
+        for array in value._mgr.arrays:
+            array = getattr(array, "_ndarray", array)  # datetime arrays wrap an ndarray
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+    return value
+
+
+class DatasetStore:
+    """Process-wide, read-only datasets shared by every session.
+
+    Each dataset is loaded once per TTL and kept as a single frame whose
+    buffers are frozen read-only. Callers get shallow views, so reads cost no
+    copy; pandas assignments on a view go to a private copy under
+    copy-on-write, and anything that would write into the shared buffers
+    raises instead.
+
+    ``probes`` optionally maps a dataset to a cheap callable returning a change
+    token; when the TTL expires and the token is unchanged, the loaded frame
+    is kept and its expiry extended instead of reloading. ``max_age`` bounds
+    how long probes may keep extending one load.
+
+    ``derived`` maps a dataset to ``(sources, build)``: it is built from the
+    store's own source datasets and rebuilt only when one of them reloads.
+
+    With a MemoryBudget, each entry is charged its size and load time, and an
+    entry the budget evicts is simply loaded again on its next read.
+    """
+
+    def __init__(self, loaders, ttl, probes=None, derived=None, max_age=None, budget=None):
+        self._loaders = dict(loaders)
+        self._probes = dict(probes or {})
+        self._derived = dict(derived or {})
+        self._ttl = ttl
+        self._max_age = max_age
+        self._budget = budget
+        self._entries = {}
+        self._locks = {name: threading.Lock() for name in self.names()}
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+
+    def names(self):
+        return list(self._loaders) + list(self._derived)
+
+    def _new_entry(self, value, token=None):
+        with self._generation_lock:
+            self._generation += 1
+            version = self._generation
+        return _Entry(value, time.time(), version, token)
+
+    def _load(self, name, build, token=None):
+        """Build and store a new entry for ``name``, charging it to the budget."""
+        started = time.perf_counter()
+        value = _freeze(build())
+        cost = time.perf_counter() - started
+        entry = self._new_entry(value, token)
+        self._entries[name] = entry
+        if self._budget is not None:
+            self._budget.admit("dataset", name, entry.size, cost, functools.partial(self._evict, name, entry))
+        return entry
+
+    def _evict(self, name, entry):
+        # Only drop the entry that was charged; a newer load has its own charge.
+        if self._entries.get(name) is entry:
+            self._entries.pop(name, None)
+
+    def _touch(self, name):
+        if self._budget is not None:
+            self._budget.touch("dataset", name)
+
+    def _derived_entry(self, name):
+        sources, build = self._derived[name]
+        inputs = [self._entry(source)[0] for source in sources]
+        token = tuple(entry.version for entry in inputs)
+        entry = self._entries.get(name)
+        if entry is not None and entry.token == token:
+            self._touch(name)
+            return entry, True
+        with self._locks[name]:
+            entry = self._entries.get(name)
+            if entry is not None and entry.token == token:
+                return entry, True
+            entry = self._load(name, lambda: build(*(_view(e.value) for e in inputs)), token)
+        return entry, False
+
+    def _fresh_entry(self, name):
+        entry = self._entries.get(name)
+        if entry is not None and time.time() - entry.loaded_at < self._ttl:
+            return entry
+        return None
+
+    def _entry(self, name):
+        """Return (entry, hit); hit is False when this call had to load the data."""
+        if name in self._derived:
+            return self._derived_entry(name)
+        entry = self._fresh_entry(name)
+        if entry is not None:
+            self._touch(name)
+            return entry, True
+        with self._locks[name]:
+            # Another session may have loaded it while we waited for the lock.
+            entry = self._fresh_entry(name)
+            if entry is not None:
+                return entry, True
+            stale = self._entries.get(name)
+            probe = self._probes.get(name)
+            token = probe() if probe else None
+            if (
+                stale is not None and token is not None and token == stale.token
+                and (self._max_age is None or time.time() - stale.fetched_at < self._max_age)
+            ):
+                stale.loaded_at = time.time()
+                self._touch(name)
+                return stale, True
+            entry = self._load(name, self._loaders[name], token)
+        return entry, False
+
+    def get(self, name):
+        return self.lookup(name)[0]
+
+    def lookup(self, name):
+        """Like get(), but also reports whether it was served without loading."""
+        entry, hit = self._entry(name)
+        return _view(entry.value), hit
+
+    def version(self, *names):
+        """Version tag of the named datasets (all loaded datasets if none given)."""
+        names = names or sorted(self._entries)
+        return "-".join(f"{n}:{self._entries[n].version}" for n in names if n in self._entries)
+
+    def memory_usage(self):
+        """Bytes held by each loaded dataset."""
+        return {name: entry.size for name, entry in list(self._entries.items())}
+
+    def refresh(self, name):
+        """Reload ``name`` now; readers keep the current entry until the new one is in place."""
+        with self._locks[name]:
+            probe = self._probes.get(name)
+            token = probe() if probe else None
+            self._load(name, self._loaders[name], token)
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+        if self._budget is not None:
+            self._budget.release("dataset", name)
+
+
+def _profile(rows):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "Date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 1095, rows), unit="D"),
+        "Agent": rng.choice([f"Agent {i}" for i in range(30)], rows),
+        "Task": rng.choice([f"Task {i}" for i in range(9)], rows),
+        "Total": rng.integers(0, 200, rows),
+    }).sort_values("Date", ignore_index=True)
+    pickled = pickle.dumps(frame)
+    store = DatasetStore({"frame": lambda: frame}, ttl=3600)
+    store.get("frame")
+    print(f"{rows:,} rows, {nbytes(frame) / 2**20:.1f} MiB")
+    for label, read in [("cache_data hit (unpickle)", lambda: pickle.loads(pickled)), ("store view", lambda: store.get("frame"))]:
+        tracemalloc.start()
+        started = time.perf_counter()
+        read()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label:<26} {elapsed * 1000:9.2f} ms  {peak / 2**20:7.2f} MiB peak")
+
+
+if __name__ == "__main__":
+    _profile(int(sys.argv[1]) if len(sys.argv) > 1 else 295_650)
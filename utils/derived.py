@@ -0,0 +1,150 @@
+"""Daily and monthly totals derived from the agent-level tab.
+
+``_RawDaily`` and ``_RawMonthly`` are rollups of ``_RawAgentDaily``. With
+DERIVED_TOTALS on, the store builds both from the agent frame (which already
+has EXCLUDED_AGENTS removed) instead of downloading them, so every total on
+the dashboard agrees with the agent breakdowns. It is off by default: the
+sheet rollups are served and each load of them is checked against the agent
+data, which feeds the drift gauge.
+
+``python -m utils.derived [team]`` downloads all three tabs and reports the days and
+months where the sheet rollups differ from the derived ones; it exits 1 when
+there is drift.
+"""
+import argparse
+import logging
+import sys
+import threading
+
+import pandas as pd
+
+from config.settings import DEFAULT_TEAM, ENGAGEMENT_TYPES, TEAMS
+from utils import metrics
+from utils.perf import timed
+
+METRICS = ENGAGEMENT_TYPES + ["Total"]
+MONTH_FORMAT = "%b %Y"
+
+logger = logging.getLogger("booster.derived")
+
+_drift = {}
+_drift_lock = threading.Lock()
+
+
+@timed("process")
+def derive_daily(df_agent_daily):
+    """One row per date with the summed metrics, shaped like the _RawDaily tab."""
+    if df_agent_daily.empty:
+        return pd.DataFrame(columns=["Date"] + METRICS)
+    return df_agent_daily.groupby("Date", sort=True)[METRICS].sum().reset_index()
+
+
+@timed("process")
+def derive_monthly(df_daily):
+    """One row per month in date order, shaped like the _RawMonthly tab."""
+    if df_daily.empty:
+        return pd.DataFrame(columns=["Month"] + METRICS)
+    monthly = df_daily.groupby(df_daily["Date"].dt.to_period("M"), sort=True)[METRICS].sum()
+    monthly.index = monthly.index.strftime(MONTH_FORMAT)
+    return monthly.rename_axis("Month").reset_index()
+
+
+# dataset -> (source datasets, build function)
+DERIVED = {
+    "raw_daily": (["raw_agent_daily"], derive_daily),
+    "raw_monthly": (["raw_daily"], derive_monthly),
+}
+
+
+def _compare(level, sheet, derived):
+    diff = derived.sub(sheet, fill_value=0)
+    drifted = diff[(diff != 0).any(axis=1)]
+    if drifted.empty:
+        return pd.DataFrame()
+    rows = drifted.stack().rename("Diff").reset_index()
+    rows.columns = ["Period", "Metric", "Diff"]
+    rows = rows[rows["Diff"] != 0].astype({"Diff": "int64"})
+    keys = list(zip(rows["Period"], rows["Metric"]))
+    rows["Sheet"] = [sheet.at[p, m] if p in sheet.index else 0 for p, m in keys]
+    rows["Derived"] = [derived.at[p, m] if p in derived.index else 0 for p, m in keys]
+    rows.insert(0, "Level", level)
+    rows["Period"] = rows["Period"].astype(str)
+    return rows[["Level", "Period", "Metric", "Sheet", "Derived", "Diff"]]
+
+
+def check_drift(df_agent_daily, sheet_daily=None, sheet_monthly=None):
+    """Days and months where the sheet rollups disagree with the agent-level data.
+
+    One row per differing (period, metric), with the sheet value, the derived
+    value and derived minus sheet. Periods missing on one side count as 0.
+    """
+    derived_daily = derive_daily(df_agent_daily)
+    frames = []
+    if sheet_daily is not None:
+        frames.append(_compare(
+            "Day",
+            sheet_daily.groupby("Date")[METRICS].sum(),
+            derived_daily.set_index("Date")[METRICS],
+        ))
+    if sheet_monthly is not None:
+        months = pd.to_datetime(sheet_monthly["Month"], format="mixed", errors="coerce").dt.to_period("M")
+        frames.append(_compare(
+            "Month",
+            sheet_monthly.groupby(months)[METRICS].sum(),
+            derived_daily.groupby(derived_daily["Date"].dt.to_period("M"))[METRICS].sum(),
+        ))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=["Level", "Period", "Metric", "Sheet", "Derived", "Diff"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def report_drift(name, sheet_frame, df_agent_daily, label=None):
+    """Log and export drift between a freshly loaded sheet rollup and the agent data.
+
+    ``label`` names the gauge series and log lines (``name`` by default).
+    """
+    label = label or name
+    try:
+        if name == "raw_daily":
+            drift = check_drift(df_agent_daily, sheet_daily=sheet_frame)
+        else:
+            drift = check_drift(df_agent_daily, sheet_monthly=sheet_frame)
+    except Exception as exc:
+        logger.warning("drift check of %s failed: %s", label, exc)
+        return None
+    periods = drift["Period"].nunique()
+    with _drift_lock:
+        _drift[label] = periods
+    if periods:
+        logger.warning("%s disagrees with _RawAgentDaily on %d period(s), e.g. %s",
+                       label, periods, ", ".join(drift["Period"].unique()[:3]))
+    return drift
+
+
+def _drift_samples():
+    with _drift_lock:
+        return {(name,): periods for name, periods in _drift.items()}
+
+
+metrics.TOTALS_DRIFT_PERIODS.set_callback("derived", _drift_samples)
+
+
+def main(argv=None):
+    from utils.sheets_connector import _load_raw_agent_daily, _load_raw_daily, _load_raw_monthly
+
+    parser = argparse.ArgumentParser(description="Report where the sheet rollups differ from _RawAgentDaily.")
+    parser.add_argument("team", nargs="?", default=DEFAULT_TEAM, choices=list(TEAMS))
+    team = TEAMS[parser.parse_args(argv).team]
+    drift = check_drift(_load_raw_agent_daily(team), _load_raw_daily(team), _load_raw_monthly(team))
+    if drift.empty:
+        print("sheet rollups match _RawAgentDaily")
+        return 0
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(drift.to_string(index=False))
+    print(f"\n{drift['Period'].nunique()} period(s) drifted", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
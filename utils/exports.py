@@ -0,0 +1,114 @@
+"""CSV and Parquet download buttons for tables and filtered raw rows.
+
+Nothing is encoded until a button is clicked: the buttons hand Streamlit a
+callable that it runs on the click. The rows are then encoded
+EXPORT_CHUNK_ROWS at a time into an in-memory buffer that is handed to
+Streamlit as is, so beyond one chunk of formatted rows the peak memory is
+about one copy of the output file (which Streamlit holds anyway to serve it),
+not a formatted copy of the whole table. Only columns are written: a frame
+whose index carries data (a Rank, say) must be passed with ``reset_index()``.
+Date-range slices of the sorted dataset frames are taken as views, and
+SqlDataset sources are read from SQLite chunk by chunk.
+"""
+import functools
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from config.settings import EXPORT_CHUNK_ROWS
+from utils import metrics
+from utils.sql_backend import SqlDataset
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def iter_rows(source, start_date=None, end_date=None, chunk_rows=EXPORT_CHUNK_ROWS, **equals):
+    """Rows of ``source`` dated in the range whose columns equal ``equals``, as DataFrame chunks."""
+    if isinstance(source, SqlDataset):
+        yield from source.iter_select(chunk_rows, start_date, end_date, **equals)
+        return
+    lo, hi = 0, len(source)
+    dates = source["Date"] if "Date" in source.columns and (start_date or end_date) else None
+    if dates is not None and dates.is_monotonic_increasing:
+        # The loaders sort by Date, so the range is one contiguous block.
+        if start_date is not None:
+            lo = int(dates.searchsorted(pd.Timestamp(start_date), side="left"))
+        if end_date is not None:
+            hi = int(dates.searchsorted(pd.Timestamp(end_date), side="right"))
+        dates = None
+    equals = {column: value for column, value in equals.items() if value is not None}
+    if dates is None and not equals:
+        for start in range(lo, hi, chunk_rows):
+            yield source.iloc[start:min(start + chunk_rows, hi)]
+        return
+    block = source.iloc[lo:hi]
+    mask = np.ones(len(block), dtype=bool)
+    if dates is not None:
+        if start_date is not None:
+            mask &= (block["Date"] >= pd.Timestamp(start_date)).to_numpy()
+        if end_date is not None:
+            mask &= (block["Date"] <= pd.Timestamp(end_date)).to_numpy()
+    for column, value in equals.items():
+        mask &= (block[column] == value).to_numpy()
+    positions = np.flatnonzero(mask)
+    for start in range(0, len(positions), chunk_rows):
+        yield block.iloc[positions[start:start + chunk_rows]]
+
+
+def _write_csv(chunks, sink, columns):
+    header = True
+    for chunk in chunks:
+        sink.write(chunk.to_csv(index=False, header=header, date_format="%Y-%m-%d").encode("utf-8"))
+        header = False
+    if header:
+        sink.write(pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8"))
+
+
+def _write_parquet(chunks, sink, columns):
+    writer = None
+    for chunk in chunks:
+        # Later chunks are cast to the first one's schema, so every row group matches.
+        table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression="zstd")
+        writer.write_table(table)
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.Table.from_pandas(pd.DataFrame(columns=columns)).schema, compression="zstd")
+    writer.close()
+
+
+_WRITERS = {"csv": _write_csv, "parquet": _write_parquet}
+
+
+def export(source, fmt, name="export", **filters):
+    """Encode the rows of ``source`` matching ``filters`` (see iter_rows) into a ``fmt`` buffer."""
+    started = time.perf_counter()
+    sink = io.BytesIO()
+    _WRITERS[fmt](iter_rows(source, **filters), sink, list(source.columns))
+    sink.seek(0)
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - started, kind="export", name=name)
+    return sink
+
+
+def download_buttons(label, source, file_name, key, **filters):
+    """Buttons "<label> CSV" and "<label> Parquet" exporting ``source``'s rows matching ``filters``.
+
+    ``source`` is a DataFrame or SqlDataset; the file is built only when a
+    button is clicked, and clicking does not rerun the page.
+    """
+    for column, fmt in zip(st.columns(len(FORMATS)), FORMATS):
+        column.download_button(
+            f"{label} {'CSV' if fmt == 'csv' else 'Parquet'}",
+            data=functools.partial(export, source, fmt, key, **filters),
+            file_name=f"{file_name}.{fmt}",
+            mime=FORMATS[fmt],
+            key=f"{key}_{fmt}",
+            on_click="ignore",
+            icon=":material/download:",
+            width="stretch",
+        )
@@ -0,0 +1,138 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from config.settings import FIGURE_CACHE_MAX_ENTRIES
+from utils import metrics, perf
+from utils.memory_budget import get_memory_budget, nbytes
+from utils.sheets_connector import dataset_version
+from utils.teams import current_team, label
+
+
+class FigureCache:
+    """LRU of built Plotly figures, shared by all sessions.
+
+    A cached figure is already validated, so st.plotly_chart only copies and
+    serializes it; rebuilding it, or passing a dict (which plotly_chart
+    re-validates into a Figure), costs about ten times as much. Figures are
+    shared, so callers must not modify them.
+
+    Bounded by ``max_entries`` and, when given a MemoryBudget, by its byte
+    budget together with the other shared caches.
+    """
+
+    def __init__(self, max_entries, budget=None):
+        self._max_entries = max_entries
+        self._budget = budget
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            figure = self._entries.get(key)
+            if figure is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if figure is not None:
+            if self._budget is not None:
+                self._budget.touch("figure", key)
+            perf.mark_cache(True)
+            metrics.CACHE_REQUESTS.inc(cache="figure", result="hit")
+            return figure
+        with self._lock:
+            self.misses += 1
+        perf.mark_cache(False)
+        metrics.CACHE_REQUESTS.inc(cache="figure", result="miss")
+
+        started = time.perf_counter()
+        figure = build()
+        cost = time.perf_counter() - started
+        size = nbytes(figure.to_dict())
+        dropped = []
+        with self._lock:
+            self._entries[key] = figure
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._sizes.pop(evicted, None)
+                self.evictions += 1
+                dropped.append(evicted)
+        if self._budget is not None:
+            for evicted in dropped:
+                self._budget.release("figure", evicted)
+            self._budget.admit("figure", key, size, cost, functools.partial(self._drop, key))
+        return figure
+
+    def _drop(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._sizes.pop(key, None)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+        if self._budget is not None:
+            self._budget.release("figure")
+
+    def memory_usage(self):
+        """Bytes held by the cached figures' data and layout."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+        }
+
+
+@st.cache_resource
+def _team_figure_cache(team):
+    cache = FigureCache(FIGURE_CACHE_MAX_ENTRIES, get_memory_budget().partition(team))
+    metrics.CACHED_BYTES.set_callback(
+        f"figure:{team}", lambda: {("figure", label(team, "figures")): cache.memory_usage()})
+    return cache
+
+
+def get_figure_cache(team=None):
+    """The figure cache of ``team`` (the session's current team by default)."""
+    return _team_figure_cache(team or current_team())
+
+
+def _key_part(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _key_part(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_key_part(v) for v in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    return str(value)
+
+
+def cached_figure(page, chart_id, params, build, datasets):
+    """Return a figure for st.plotly_chart, building it only on a cache miss.
+
+    The key is (dataset versions, page, chart id, filter params), so widget
+    changes that don't touch ``params`` reuse the cached figure.
+    """
+    key = (dataset_version(*datasets), page, chart_id, _key_part(params))
+    with perf.stage("chart", chart_id):
+        return get_figure_cache().get_or_build(key, build)
+
+
+def figure_cache_stats():
+    return get_figure_cache().stats()
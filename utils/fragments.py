@@ -0,0 +1,93 @@
+"""Page sections that rerun on their own, with declared dependencies."""
+import functools
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from utils import metrics, perf
+from utils.memory_budget import get_memory_budget, nbytes
+from utils.sheets_connector import dataset_version
+from utils.teams import current_team, label
+
+
+def section(name):
+    """Run a page section as an ``st.fragment``.
+
+    Widgets created inside the section rerun only the section. A rerun of
+    just this section is timed as its own perf run, ``<page>:<name>``.
+    """
+    def decorator(func):
+        @st.fragment
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if perf.active():
+                return func(*args, **kwargs)
+            perf.start_run(f"{perf.last_page()}:{name}")
+            try:
+                return func(*args, **kwargs)
+            finally:
+                perf.finish_run(panel=False)
+        return wrapper
+    return decorator
+
+
+_MISSING = object()
+
+
+def _view(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(_view(v) for v in value)
+    if isinstance(value, (dict, list)):
+        return type(value)(value)
+    return value
+
+
+@st.cache_resource
+def _memo(team):
+    budget = get_memory_budget().partition(team)
+    metrics.CACHED_BYTES.set_callback(
+        f"section:{team}", lambda: {("section", label(team, "results")): budget.usage().get("section", 0)})
+    return {"lock": threading.Lock(), "entries": {}, "budget": budget}
+
+
+def _drop(memo, memo_key):
+    with memo["lock"]:
+        memo["entries"].pop(memo_key, None)
+
+
+def depends_on(key, deps, compute, datasets):
+    """compute(), reused across sessions while ``deps`` and the datasets are unchanged.
+
+    ``deps`` holds the plain filter values the section reads, so a full rerun
+    triggered by an unrelated filter skips the section's aggregations. Results
+    are kept per team and charged to its memory budget; results built from an older
+    version of the datasets are dropped as soon as a newer one is stored.
+    """
+    with perf.stage("process", key):
+        version = dataset_version(*datasets)
+        memo_key = (key, version, deps)
+        memo = _memo(current_team())
+        budget = memo["budget"]
+        with memo["lock"]:
+            value = memo["entries"].get(memo_key, _MISSING)
+        hit = value is not _MISSING
+        if hit:
+            budget.touch("section", memo_key)
+        else:
+            started = time.perf_counter()
+            value = compute()
+            cost = time.perf_counter() - started
+            with memo["lock"]:
+                stale = [k for k in memo["entries"] if k[0] == key and k[1] != version]
+                for k in stale:
+                    del memo["entries"][k]
+                memo["entries"][memo_key] = value
+            for k in stale:
+                budget.release("section", k)
+            budget.admit("section", memo_key, nbytes(value), cost, functools.partial(_drop, memo, memo_key))
+        perf.mark_cache(hit)
+    return _view(value)
@@ -0,0 +1,182 @@
+"""Push invalidation of single datasets, driven by Sheets edit triggers.
+
+With INVALIDATE_TOKEN and METRICS_PORT set, the sidecar accepts::
+
+    POST /invalidate
+    Authorization: Bearer <INVALIDATE_TOKEN>
+    {"spreadsheet": "<spreadsheet id>", "sheet": "_RawAgentDaily"}
+
+An installable Apps Script onEdit trigger on either spreadsheet can send it::
+
+    function pushEdit(e) {
+      UrlFetchApp.fetch(DASHBOARD_URL + "/invalidate", {
+        method: "post",
+        contentType: "application/json",
+        headers: {Authorization: "Bearer " + TOKEN},
+        payload: JSON.stringify({spreadsheet: e.source.getId(), sheet: e.range.getSheet().getName()}),
+      });
+    }
+
+With several TEAMS, the spreadsheet id picks the team (or pass ``"team"``
+explicitly). Only that team's dataset behind the tab is reloaded, in the background and
+INVALIDATE_DEBOUNCE_SECONDS after the first edit of a burst. Pages keep the
+previous data until the reload lands. Its new version then invalidates the
+charts, memoized sections and derived datasets built from it.
+
+``python -m utils.invalidation <tab> [--team <id>]`` sends the same request locally.
+"""
+import argparse
+import hmac
+import json
+import logging
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+from config.settings import DEFAULT_TEAM, INVALIDATE_DEBOUNCE_SECONDS, INVALIDATE_TOKEN, METRICS_PORT, TEAMS
+from utils import metrics, sidecar
+from utils.teams import label
+
+logger = logging.getLogger("booster.invalidation")
+
+TAB_DATASETS = {
+    "_AgentList": "agent_list",
+    "_RawDaily": "raw_daily",
+    "_RawAgentDaily": "raw_agent_daily",
+    "_RawTaskDaily": "task_daily",
+    "_RawMonthly": "raw_monthly",
+}
+
+
+# team -> (RefreshQueue, loaded dataset names, derived dataset names), for teams whose store exists
+_installed = {}
+
+
+def team_for(spreadsheet):
+    """Team whose engagement or accounts spreadsheet has this id (DEFAULT_TEAM if none)."""
+    for team, config in TEAMS.items():
+        if spreadsheet and spreadsheet in (config["engagement_sheet_id"], config["accounts_sheet_id"]):
+            return team
+    return DEFAULT_TEAM
+
+
+def dataset_for(spreadsheet, sheet, team=DEFAULT_TEAM):
+    """Dataset loaded from a tab; every tab of the accounts spreadsheet feeds account_data."""
+    if spreadsheet and spreadsheet == TEAMS[team]["accounts_sheet_id"]:
+        return "account_data"
+    return TAB_DATASETS.get(sheet)
+
+
+class RefreshQueue:
+    """Reloads invalidated datasets in the background, once per burst of edits."""
+
+    def __init__(self, store, delay, team=DEFAULT_TEAM):
+        self._store = store
+        self._delay = delay
+        self._team = team
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def push(self, name):
+        """Schedule a reload of ``name``; returns False if one is already pending."""
+        with self._lock:
+            if name in self._pending:
+                return False
+            timer = threading.Timer(self._delay, self._refresh, (name,))
+            timer.daemon = True
+            self._pending[name] = timer
+        timer.start()
+        return True
+
+    def _refresh(self, name):
+        with self._lock:
+            # Edits arriving while the reload runs schedule another one.
+            self._pending.pop(name, None)
+        try:
+            self._store.refresh(name)
+            result = "refreshed"
+        except Exception as exc:
+            # Drop the entry so the next page view retries the load itself.
+            logger.warning("refresh of %s failed: %s", name, exc)
+            self._store.invalidate(name)
+            result = "failed"
+        metrics.INVALIDATIONS.inc(dataset=label(self._team, name), result=result)
+
+
+def _authorized(request):
+    header = request.headers.get("Authorization", "")
+    return header.startswith("Bearer ") and hmac.compare_digest(header[7:].encode(), INVALIDATE_TOKEN.encode())
+
+
+def _json(code, **fields):
+    return code, "application/json", json.dumps(fields) + "\n"
+
+
+def _invalidate_route(request):
+    if not _authorized(request):
+        return _json(401, error="unauthorized")
+    try:
+        length = int(request.headers.get("Content-Length") or 0)
+        body = json.loads(request.rfile.read(length) or b"{}")
+    except ValueError:
+        return _json(400, error="body must be JSON")
+    if not isinstance(body, dict):
+        return _json(400, error="body must be a JSON object")
+    team = body.get("team") or team_for(body.get("spreadsheet"))
+    if team not in TEAMS:
+        return _json(404, error=f"unknown team {team!r}")
+    if team not in _installed:
+        # Nobody has opened this team since the process started, so nothing is cached.
+        return _json(200, team=team, status="not loaded")
+    queue, loaded, derived = _installed[team]
+    name = body.get("dataset") or dataset_for(body.get("spreadsheet"), body.get("sheet", ""), team)
+    if name in derived:
+        # Built from other datasets in the store; it follows their reloads.
+        return _json(200, team=team, dataset=name, status="derived")
+    if name not in loaded:
+        return _json(404, error=f"no dataset for sheet {body.get('sheet')!r}")
+    queued = queue.push(name)
+    metrics.INVALIDATIONS.inc(dataset=label(team, name), result="queued" if queued else "coalesced")
+    return _json(202, team=team, dataset=name, status="queued" if queued else "already queued")
+
+
+def install(store, derived=(), team=DEFAULT_TEAM):
+    """Serve POST /invalidate for ``team``'s ``store``; returns the queue, or None when disabled."""
+    if not INVALIDATE_TOKEN:
+        return None
+    queue = RefreshQueue(store, INVALIDATE_DEBOUNCE_SECONDS, team)
+    _installed[team] = (queue, set(store.names()) - set(derived), set(derived))
+    sidecar.register_route("POST", "/invalidate", _invalidate_route)
+    return queue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send the invalidation an edit trigger would send.")
+    parser.add_argument("sheet", help="tab name, e.g. _RawAgentDaily")
+    parser.add_argument("--spreadsheet", default="", help="spreadsheet id (the accounts id maps to account_data)")
+    parser.add_argument("--team", default="", help="team id (default: the team owning --spreadsheet)")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{METRICS_PORT}/invalidate" if METRICS_PORT else None)
+    args = parser.parse_args(argv)
+    if not args.url:
+        sys.exit("Set METRICS_PORT to the sidecar port the dashboard was started with, or pass --url.")
+    if not INVALIDATE_TOKEN:
+        sys.exit("Set INVALIDATE_TOKEN to the token the dashboard was started with.")
+
+    request = urllib.request.Request(
+        args.url,
+        data=json.dumps({"spreadsheet": args.spreadsheet, "sheet": args.sheet, "team": args.team}).encode(),
+        headers={"Authorization": f"Bearer {INVALIDATE_TOKEN}", "Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print(response.status, response.read().decode().strip())
+    except urllib.error.HTTPError as exc:
+        print(exc.code, exc.read().decode().strip(), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Pages bind ``px`` through this, so a rerun whose charts all come from the
+    figure cache never imports plotly.express, the expensive part of plotly.
+    ``plotly.graph_objects`` is imported directly: st.plotly_chart loads it on
+    every call anyway.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+px = LazyModule("plotly.express")
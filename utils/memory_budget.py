@@ -0,0 +1,232 @@
+"""One memory budget shared by the dataset stores, figure caches and section memos.
+
+Each cache reports the measured size of an entry and how long it took to
+build when it stores it, and every hit touches the entry. When the total goes
+over CACHE_MEMORY_BUDGET_MB, entries are evicted by GreedyDual-Size: an
+entry's priority is the eviction clock at its last use plus its rebuild
+seconds per byte, the lowest priority goes first and the clock advances to
+it. Large, cheap entries therefore go before small or slow ones, and among
+equals the least recently used goes first. The evicted entry's owner drops it
+and rebuilds it on the next request.
+
+Entries sit in a heap per partition ordered by priority. A hit only raises
+the entry's priority, and a popped entry whose priority has since risen is
+pushed back, so touches cost O(1) and each eviction O(log n).
+"""
+import heapq
+import itertools
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.settings import CACHE_MEMORY_BUDGET_MB, TEAMS
+from utils import metrics
+
+
+def nbytes(value):
+    """Bytes held by a cached value, counting the objects it references."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(k) + nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Charge:
+    __slots__ = ("size", "cost", "priority", "on_evict", "partition")
+
+    def __init__(self, size, cost, priority, on_evict, partition):
+        self.size = size
+        self.cost = cost
+        self.priority = priority
+        self.on_evict = on_evict
+        self.partition = partition
+
+
+class MemoryBudget:
+    """Byte accounting and cost-aware LRU eviction across several caches.
+
+    Entries may belong to a partition (a team) with its own cap from
+    ``set_cap``; a partition over its cap evicts its own entries first.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self._charges = {}
+        self._heaps = {}  # partition -> [(priority, seq, key, charge)], may hold stale items
+        self._seq = itertools.count()
+        self._used = {}
+        self._caps = {}
+        self._clock = 0.0
+        self._lock = threading.Lock()
+        self.evictions = {}
+
+    def set_cap(self, partition, cap_bytes):
+        with self._lock:
+            self._caps[partition] = cap_bytes
+
+    def partition(self, name):
+        """View of the budget whose entries are charged to partition ``name``."""
+        return _Partition(self, name)
+
+    def _priority(self, charge):
+        return self._clock + charge.cost / max(charge.size, 1)
+
+    def admit(self, cache, key, size, cost, on_evict, partition=None):
+        """Charge a newly stored entry to ``cache`` and evict others until the total fits.
+
+        ``on_evict`` is called, outside the budget's lock, for each entry
+        evicted; it must drop that entry from its cache.
+        """
+        charge = _Charge(size, cost, 0.0, on_evict, partition)
+        with self._lock:
+            self._discard((cache, key))
+            charge.priority = self._priority(charge)
+            self._charges[(cache, key)] = charge
+            self._push((cache, key), charge)
+            self._used[(cache, partition)] = self._used.get((cache, partition), 0) + size
+            victims = []
+            cap = self._caps.get(partition)
+            if cap:
+                victims += self._shrink((cache, key), cap, partition)
+            victims += self._shrink((cache, key), self.budget)
+        for name, charge in victims:
+            charge.on_evict()
+            metrics.CACHE_EVICTIONS.inc(cache=name)
+
+    def touch(self, cache, key):
+        """Record a hit, which restores the entry's priority above the clock."""
+        with self._lock:
+            charge = self._charges.get((cache, key))
+            if charge is not None:
+                charge.priority = self._priority(charge)
+
+    def release(self, cache, key=None, partition=None):
+        """Stop charging an entry (or all of ``cache`` in ``partition``) its owner dropped on its own."""
+        with self._lock:
+            if key is not None:
+                self._discard((cache, key))
+                return
+            for k in [k for k, c in self._charges.items() if k[0] == cache and c.partition == partition]:
+                self._discard(k)
+
+    def _discard(self, key):
+        charge = self._charges.pop(key, None)
+        if charge is not None:
+            self._used[(key[0], charge.partition)] -= charge.size
+        return charge
+
+    def _total(self, partition=None):
+        return sum(size for (_, p), size in self._used.items() if partition is None or p == partition)
+
+    def _push(self, key, charge):
+        heap = self._heaps.setdefault(charge.partition, [])
+        if len(heap) > 2 * len(self._charges) + 64:
+            # Drop the items of discarded entries once they outnumber the live ones.
+            heap[:] = [item for item in heap if self._charges.get(item[2]) is item[3]]
+            heapq.heapify(heap)
+        heapq.heappush(heap, (charge.priority, next(self._seq), key, charge))
+
+    def _top(self, heap):
+        """Lowest-priority live item of ``heap``, after settling stale ones; None if empty."""
+        while heap:
+            priority, _, key, charge = heap[0]
+            if self._charges.get(key) is not charge:
+                heapq.heappop(heap)
+            elif priority < charge.priority:
+                heapq.heapreplace(heap, (charge.priority, next(self._seq), key, charge))
+            else:
+                return heap[0]
+        return None
+
+    def _pop_lowest(self, partition):
+        heaps = [self._heaps.get(partition, [])] if partition is not None else list(self._heaps.values())
+        best = None
+        for heap in heaps:
+            item = self._top(heap)
+            if item is not None and (best is None or item < best[1]):
+                best = (heap, item)
+        if best is None:
+            return None
+        return heapq.heappop(best[0])
+
+    def _shrink(self, keep, limit, partition=None):
+        victims = []
+        held = []
+        while self._total(partition) > limit:
+            item = self._pop_lowest(partition)
+            if item is None:
+                break
+            key = item[2]
+            if key == keep:
+                held.append(item)
+                continue
+            charge = self._discard(key)
+            self._clock = max(self._clock, charge.priority)
+            self.evictions[key[0]] = self.evictions.get(key[0], 0) + 1
+            victims.append((key[0], charge))
+        for item in held:
+            heapq.heappush(self._heaps[item[3].partition], item)
+        return victims
+
+    def usage(self, partition=None):
+        """Bytes currently charged, per cache (within ``partition`` if given)."""
+        return self.stats(partition)["by_cache"]
+
+    def stats(self, partition=None):
+        with self._lock:
+            limit = self._caps.get(partition) or self.budget
+            used = self._total(partition)
+            by_cache = {}
+            for (cache, p), size in self._used.items():
+                if partition is None or p == partition:
+                    by_cache[cache] = by_cache.get(cache, 0) + size
+            return {
+                "budget": limit,
+                "used": used,
+                "used_pct": round(used / limit * 100, 1) if limit else 0.0,
+                "entries": sum(1 for c in self._charges.values() if partition is None or c.partition == partition),
+                "by_cache": by_cache,
+                "evictions": dict(self.evictions),
+            }
+
+
+class _Partition:
+    """One team's view of a MemoryBudget: its keys are namespaced and count against its cap."""
+
+    def __init__(self, budget, name):
+        self._budget = budget
+        self.name = name
+
+    def admit(self, cache, key, size, cost, on_evict):
+        self._budget.admit(cache, (self.name, key), size, cost, on_evict, partition=self.name)
+
+    def touch(self, cache, key):
+        self._budget.touch(cache, (self.name, key))
+
+    def release(self, cache, key=None):
+        self._budget.release(cache, None if key is None else (self.name, key), partition=self.name)
+
+    def usage(self):
+        return self._budget.usage(self.name)
+
+    def stats(self):
+        return self._budget.stats(self.name)
+
+
+@st.cache_resource
+def get_memory_budget():
+    budget = MemoryBudget(CACHE_MEMORY_BUDGET_MB * 1024 * 1024)
+    for team, config in TEAMS.items():
+        if config["memory_mb"]:
+            budget.set_cap(team, config["memory_mb"] * 1024 * 1024)
+    metrics.CACHE_BUDGET_BYTES.set_callback("budget", lambda: {(): budget.budget})
+    return budget
@@ -0,0 +1,159 @@
+"""In-process counters and histograms exposed in Prometheus text format."""
+import bisect
+import os
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _label_str(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(c), s) for k, (c, s) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge whose values are read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks = {}
+
+    def set_callback(self, key, fn):
+        """fn() returns {label-values tuple: value}; a later fn with the same key replaces it."""
+        with self._lock:
+            self._callbacks[key] = fn
+
+    def samples(self):
+        with self._lock:
+            callbacks = list(self._callbacks.values())
+        lines = []
+        for fn in callbacks:
+            try:
+                values = fn()
+            except Exception:
+                continue
+            for key, value in values.items():
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return {(): pages * os.sysconf("SC_PAGE_SIZE")}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+SHEETS_FETCH_SECONDS = Histogram(
+    "booster_sheets_fetch_seconds", "Time spent downloading a tab from Google Sheets.", ["dataset"])
+SHEETS_ERRORS = Counter(
+    "booster_sheets_errors_total", "Failed Google Sheets requests by HTTP status (429 = rate limited).",
+    ["dataset", "status"])
+PARSE_SECONDS = Histogram(
+    "booster_parse_seconds", "Time spent parsing downloaded tab values into a DataFrame.", ["dataset"])
+STAGE_SECONDS = Histogram(
+    "booster_stage_seconds", "Duration of instrumented fetch/process/chart stages.", ["kind", "name"])
+PAGE_RENDER_SECONDS = Histogram(
+    "booster_page_render_seconds", "Full script run time per page.", ["page"])
+CACHE_REQUESTS = Counter(
+    "booster_cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+CACHED_BYTES = Gauge(
+    "booster_cached_bytes", "Memory held by cached entries.", ["cache", "name"])
+CACHE_BUDGET_BYTES = Gauge(
+    "booster_cache_budget_bytes", "Memory budget shared by the dataset, figure and section caches.")
+CACHE_EVICTIONS = Counter(
+    "booster_cache_evictions_total", "Entries evicted to stay within the cache memory budget.", ["cache"])
+INVALIDATIONS = Counter(
+    "booster_invalidations_total", "Pushed dataset invalidations by outcome.", ["dataset", "result"])
+TOTALS_DRIFT_PERIODS = Gauge(
+    "booster_totals_drift_periods",
+    "Days or months where a sheet rollup tab disagrees with the agent-level tab.", ["dataset"])
+PROCESS_RESIDENT_BYTES = Gauge(
+    "booster_process_resident_memory_bytes", "Resident set size of this process.")
+PROCESS_RESIDENT_BYTES.set_callback("process", _resident_memory)
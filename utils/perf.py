@@ -0,0 +1,161 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import streamlit as st
+
+from config.settings import PERF_DEBUG, PERF_LOG
+from utils import metrics, profiler, sidecar
+
+logger = logging.getLogger("booster.perf")
+if PERF_LOG and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_HISTORY = 20
+_current_run = contextvars.ContextVar("booster_perf_run", default=None)
+_current_stage = contextvars.ContextVar("booster_perf_stage", default=None)
+
+
+class _Run:
+    def __init__(self, page):
+        self.page = page
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.stages = []
+        self.profile = None
+
+
+def active():
+    """True while a full script run of a page is being timed."""
+    return _current_run.get() is not None
+
+
+def last_page():
+    """Page of this session's most recent full run (fragment reruns are labelled with it)."""
+    return st.session_state.get("_perf_page", "unknown")
+
+
+def start_run(page):
+    """Begin timing one script run of ``page``; call at the top of the page."""
+    sidecar.ensure_started()
+    st.session_state["_perf_page"] = page
+    run = _Run(page)
+    _current_run.set(run)
+    if profiler.requested():
+        run.profile = profiler.start(page, run.run_id)
+    return run
+
+
+@contextmanager
+def stage(kind, name):
+    """Time a block as a stage of the current run.
+
+    ``kind`` is fetch, process or chart. Inside the block, ``mark_cache``
+    records whether the stage was served from a cache.
+    """
+    parent = _current_stage.get()
+    depth = parent["depth"] + 1 if parent is not None else 0
+    record = {"kind": kind, "name": name, "ms": 0.0, "cache": None, "depth": depth}
+    token = _current_stage.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        elapsed = time.perf_counter() - started
+        record["ms"] = round(elapsed * 1000, 2)
+        _current_stage.reset(token)
+        metrics.STAGE_SECONDS.observe(elapsed, kind=kind, name=name)
+        run = _current_run.get()
+        if run is not None:
+            run.stages.append(record)
+
+
+def mark_cache(hit):
+    record = _current_stage.get()
+    if record is not None:
+        record["cache"] = "hit" if hit else "miss"
+
+
+def timed(kind):
+    """Decorator that records every call of the function as a stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(kind, func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _summary(run, total_ms):
+    by_kind = {}
+    for rec in run.stages:
+        if rec["depth"]:
+            continue  # already counted in its enclosing stage
+        by_kind[rec["kind"]] = round(by_kind.get(rec["kind"], 0.0) + rec["ms"], 2)
+    hits = sum(1 for rec in run.stages if rec["cache"] == "hit")
+    misses = sum(1 for rec in run.stages if rec["cache"] == "miss")
+    return {
+        "event": "rerun",
+        "page": run.page,
+        "run_id": run.run_id,
+        "ts": time.time(),
+        "pid": os.getpid(),
+        "total_ms": total_ms,
+        "by_kind": by_kind,
+        "cache_hits": hits,
+        "cache_misses": misses,
+        "stages": run.stages,
+    }
+
+
+def _debug_enabled():
+    return PERF_DEBUG or st.query_params.get("debug") == "1"
+
+
+def finish_run(panel=True):
+    """Close the current run: log it as JSON and show the debug panel if enabled.
+
+    Pass ``panel=False`` inside fragments, which cannot write to the sidebar.
+    """
+    run = _current_run.get()
+    if run is None:
+        return None
+    _current_run.set(None)
+    elapsed = time.perf_counter() - run.started
+    total_ms = round(elapsed * 1000, 2)
+    metrics.PAGE_RENDER_SECONDS.observe(elapsed, page=run.page)
+    summary = _summary(run, total_ms)
+    if run.profile is not None:
+        summary["profile"] = profiler.stop(run.profile, summary)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(summary, default=str))
+
+    history = st.session_state.setdefault("_perf_history", {}).setdefault(run.page, [])
+    history.append(total_ms)
+    del history[:-_HISTORY]
+    if panel and _debug_enabled():
+        _render_debug_panel(summary, history)
+    return summary
+
+
+def _render_debug_panel(summary, history):
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(
+            f"Run {summary['run_id']}: {summary['total_ms']:,.0f} ms total, "
+            f"avg {sum(history) / len(history):,.0f} ms over last {len(history)} runs of this page"
+        )
+        st.caption(" | ".join(f"{k}: {v:,.0f} ms" for k, v in summary["by_kind"].items()))
+        st.caption(f"Cache: {summary['cache_hits']} hits, {summary['cache_misses']} misses")
+        if summary["stages"]:
+            st.dataframe(summary["stages"], use_container_width=True, hide_index=True)
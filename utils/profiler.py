@@ -0,0 +1,163 @@
+"""Opt-in CPU and allocation profiling of a single script run.
+
+Enabled for every run with PROFILE=1, or for runs of a page opened with
+``?profile=1``. Each profiled run writes a directory under PROFILE_DIR holding
+the cProfile dump (``cpu.prof``, loadable by pstats/snakeviz), the hottest
+functions, the top allocation sites and the session's filter state.
+
+Only one run is profiled at a time, process-wide: cProfile allows a single
+active profiler, so a run requested while another is being profiled goes
+unprofiled. A run that never reaches ``stop`` (st.stop or an exception) is
+released when its session starts another run or its script thread has ended.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import shutil
+import threading
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config.settings import PROFILE_ALWAYS, PROFILE_DIR, PROFILE_KEEP
+
+logger = logging.getLogger("booster.profiler")
+
+_TOP_FUNCTIONS = 40
+_TOP_ALLOCATIONS = 25
+
+_active = None  # the one _Session being profiled in this process
+_active_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+class _Session:
+    def __init__(self, page, run_id, owner):
+        self.page = page
+        self.run_id = run_id
+        self.owner = owner
+        self.thread = threading.current_thread()
+        self.profiler = cProfile.Profile()
+        self.baseline = None
+
+    def abandoned(self, owner):
+        """True when the run can no longer reach stop(): its session moved on or its thread ended."""
+        return (owner is not None and self.owner == owner) or self.thread is threading.current_thread() or not self.thread.is_alive()
+
+
+def requested():
+    return PROFILE_ALWAYS or st.query_params.get("profile") == "1"
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users = max(0, _tracemalloc_users - 1)
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _discard(session):
+    session.profiler.disable()
+    _release_tracemalloc()
+
+
+def _owner():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def start(page, run_id):
+    """Begin profiling the current run; returns the session, or None if another run is being profiled."""
+    global _active
+    owner = _owner()
+    with _active_lock:
+        if _active is not None:
+            if not _active.abandoned(owner):
+                logger.warning("not profiling %s: run %s is already being profiled", page, _active.run_id)
+                return None
+            _discard(_active)
+            _active = None
+        session = _Session(page, run_id, owner)
+        _acquire_tracemalloc()
+        session.baseline = tracemalloc.take_snapshot()
+        try:
+            session.profiler.enable()
+        except ValueError as exc:  # another profiling tool (a debugger, say) holds the hook
+            _release_tracemalloc()
+            logger.warning("not profiling %s: %s", page, exc)
+            return None
+        _active = session
+    return session
+
+
+def _filter_state():
+    state = {k: v for k, v in st.session_state.items() if not str(k).startswith("_")}
+    return {"query_params": dict(st.query_params), "session_state": state}
+
+
+def _cpu_report(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(_TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def _allocation_report(baseline, snapshot):
+    lines = []
+    for stat in snapshot.compare_to(baseline, "lineno")[:_TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {frame.filename}:{frame.lineno}"
+        )
+    current, peak = tracemalloc.get_traced_memory()
+    lines.append(f"\ntraced now {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB")
+    return "\n".join(lines) + "\n"
+
+
+def _prune(directory):
+    runs = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    for name in runs[:-PROFILE_KEEP]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def stop(session, summary):
+    """Stop profiling and write the run's profile directory; returns its path, or None if released."""
+    global _active
+    with _active_lock:
+        if _active is not session:
+            return None  # released as abandoned by a later run
+        session.profiler.disable()
+        _active = None
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            allocations = _allocation_report(session.baseline, snapshot)
+        finally:
+            _release_tracemalloc()
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(PROFILE_DIR, f"{stamp}-{session.page}-{session.run_id}")
+    os.makedirs(path, exist_ok=True)
+    session.profiler.dump_stats(os.path.join(path, "cpu.prof"))
+    with open(os.path.join(path, "cpu_top.txt"), "w") as f:
+        f.write(_cpu_report(session.profiler))
+    with open(os.path.join(path, "allocations.txt"), "w") as f:
+        f.write(allocations)
+    with open(os.path.join(path, "state.json"), "w") as f:
+        json.dump({"page": session.page, "summary": summary, **_filter_state()}, f, indent=2, default=str)
+    _prune(PROFILE_DIR)
+    logger.warning("profile of %s written to %s", session.page, path)
+    return path
@@ -0,0 +1,251 @@
+"""Per-agent rolling statistics with O(1) window queries.
+
+``RollingStats`` keeps, for every agent and metric, prefix sums of the daily
+values over a gap-free day axis, a prefix count of active days (Total > 0),
+and prefix sums over active days of the values' deviations from a per-agent
+centre and of their squares. The centre is the mean of the agent's first
+active days, so the variance is taken from mean-centred values rather than
+raw sums of squares, which cancel badly for agents with large daily counts.
+The mean, standard deviation, coefficient of variation and z-score over any
+date range are then a few array lookups, with no rescan of the history. New
+days are folded in by ``extend`` without recomputing the days already held.
+"""
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.settings import ALERT_Z_THRESHOLD, ENGAGEMENT_TYPES
+from utils.perf import timed
+from utils.sheets_connector import dataset_version, fetch_raw_agent_daily
+from utils.teams import current_team
+
+METRICS = ENGAGEMENT_TYPES + ["Total"]
+MIN_BASELINE_DAYS = 3  # active days a window needs before its z-scores are reported
+
+_TOTAL = METRICS.index("Total")
+_HASHED = ["Date", "Agent"] + METRICS
+
+
+def _digest(df):
+    """Order-independent hash of the rows' date, agent and metric values (mod 2**64)."""
+    return int(pd.util.hash_pandas_object(df[_HASHED], index=False).sum())
+
+
+def _std(n, d, q):
+    """Sample standard deviation from count, sum and sum of squares of centred values (NaN below 2)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (q - d * d / n) / (n - 1)
+    return np.where(n > 1, np.sqrt(np.clip(var, 0, None)), np.nan)
+
+
+class RollingStats:
+    """Prefix sums per (agent, metric, day) and a variance centre per (agent, metric).
+
+    ``extend`` writes only past ``days`` or into fresh arrays, so a ``fork``
+    can be extended while sessions keep reading the original.
+    """
+
+    def __init__(self):
+        self.agents = []
+        self._pos = {}
+        self.start = None
+        self.days = 0
+        # index d holds the total over days < d, so a range [lo, hi) is p[hi] - p[lo]
+        self._sum = np.zeros((0, len(METRICS), 1))
+        self._dev = np.zeros((0, len(METRICS), 1))
+        self._sq = np.zeros((0, len(METRICS), 1))
+        self._active = np.zeros((0, 1))
+        self._centre = np.zeros((0, len(METRICS)))
+        self._rows = 0
+        self._digest = 0
+
+    @property
+    def end(self):
+        return self.start + pd.Timedelta(days=self.days - 1) if self.days else None
+
+    def fork(self):
+        """Copy that can be extended without changing what this one reports."""
+        other = copy.copy(self)
+        other.agents = list(self.agents)
+        other._pos = dict(self._pos)
+        return other
+
+    def matches(self, df):
+        """True when ``df`` holds exactly the rows already folded in, plus later days."""
+        if not self.days:
+            return True
+        held = df[df["Date"] <= self.end]
+        return len(held) == self._rows and _digest(held) == self._digest
+
+    def _add_agents(self, names):
+        new = [a for a in dict.fromkeys(names) if a not in self._pos]
+        if not new:
+            return
+        for name in new:
+            self._pos[name] = len(self.agents)
+            self.agents.append(name)
+        pad = len(new)
+        self._sum = np.concatenate([self._sum, np.zeros((pad,) + self._sum.shape[1:])])
+        self._dev = np.concatenate([self._dev, np.zeros((pad,) + self._dev.shape[1:])])
+        self._sq = np.concatenate([self._sq, np.zeros((pad,) + self._sq.shape[1:])])
+        self._active = np.concatenate([self._active, np.zeros((pad,) + self._active.shape[1:])])
+        self._centre = np.concatenate([self._centre, np.zeros((pad, len(METRICS)))])
+
+    def _reserve(self, days):
+        """Grow the day axis geometrically so appending a day is amortized O(agents)."""
+        capacity = self._sum.shape[2] - 1
+        if days <= capacity:
+            return
+        extra = max(days, 2 * capacity) - capacity
+        self._sum = np.concatenate([self._sum, np.zeros(self._sum.shape[:2] + (extra,))], axis=2)
+        self._dev = np.concatenate([self._dev, np.zeros(self._dev.shape[:2] + (extra,))], axis=2)
+        self._sq = np.concatenate([self._sq, np.zeros(self._sq.shape[:2] + (extra,))], axis=2)
+        self._active = np.concatenate([self._active, np.zeros((self._active.shape[0], extra))], axis=1)
+
+    def extend(self, df):
+        """Fold in the rows dated after the last day held; returns how many were added."""
+        if self.days:
+            df = df[df["Date"] > self.end]
+        if df.empty:
+            return 0
+        if self.start is None:
+            self.start = df["Date"].min()
+        self._add_agents(df["Agent"])
+
+        first = self.days
+        new_days = (df["Date"].max() - self.start).days + 1 - first
+        self._reserve(first + new_days)
+
+        block = np.zeros((len(self.agents), len(METRICS), new_days))
+        rows = df["Agent"].map(self._pos).to_numpy()
+        offsets = (df["Date"] - self.start).dt.days.to_numpy() - first
+        values = df[METRICS].to_numpy(dtype=float)
+        np.add.at(block, (rows[:, None], np.arange(len(METRICS))[None, :], offsets[:, None]), values)
+
+        active = block[:, _TOTAL, :] > 0
+        n_block = active.sum(axis=1)
+        # Agents active for the first time are centred on this block's active-day mean;
+        # their deviation sums are still all zero, so the earlier days are unaffected.
+        fresh = (self._active[:, first] == 0) & (n_block > 0)
+        if fresh.any():
+            centre = self._centre.copy()
+            centre[fresh] = (block[fresh] * active[fresh, None, :]).sum(axis=2) / n_block[fresh, None]
+            self._centre = centre
+        dev = (block - self._centre[:, :, None]) * active[:, None, :]
+
+        self._sum[:, :, first + 1:first + new_days + 1] = self._sum[:, :, first:first + 1] + block.cumsum(axis=2)
+        self._dev[:, :, first + 1:first + new_days + 1] = self._dev[:, :, first:first + 1] + dev.cumsum(axis=2)
+        self._sq[:, :, first + 1:first + new_days + 1] = self._sq[:, :, first:first + 1] + (dev ** 2).cumsum(axis=2)
+        self._active[:, first + 1:first + new_days + 1] = self._active[:, first:first + 1] + active.cumsum(axis=1)
+
+        self._rows += len(df)
+        self._digest = (self._digest + _digest(df)) % 2**64
+        self.days = first + new_days
+        return len(df)
+
+    def _span(self, start_date, end_date):
+        """Clipped [lo, hi) day indices for an inclusive date range."""
+        if not self.days:
+            return 0, 0
+        hi = (pd.Timestamp(end_date) - self.start).days + 1
+        lo = 0 if start_date is None else (pd.Timestamp(start_date) - self.start).days
+        return min(max(lo, 0), self.days), min(max(hi, 0), self.days)
+
+    def range_table(self, start_date, end_date, metric="Total"):
+        """Active days, mean, std, CV and consistency per agent over a date range."""
+        lo, hi = self._span(start_date, end_date)
+        m = METRICS.index(metric)
+        n = self._active[:, hi] - self._active[:, lo]
+        s = self._sum[:, m, hi] - self._sum[:, m, lo]
+        d = self._dev[:, m, hi] - self._dev[:, m, lo]
+        q = self._sq[:, m, hi] - self._sq[:, m, lo]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(n > 0, s / n, np.nan)
+        std = _std(n, d, q)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = std / mean * 100
+        table = pd.DataFrame(
+            {"Active Days": n.astype(int), "Sum": s, "Mean": mean, "Std": std, "CV": cv},
+            index=pd.Index(self.agents, name="Agent"),
+        )
+        table["Consistency"] = (100 - table["CV"]).clip(lower=0).round(1).where(table["Active Days"] > 1, 100.0)
+        return table
+
+    def window(self, agent, end_date, days, metric="Total"):
+        """Stats row for one agent over the ``days`` days ending on ``end_date``."""
+        start = pd.Timestamp(end_date) - pd.Timedelta(days=days - 1)
+        table = self.range_table(start, end_date, metric)
+        return table.loc[agent] if agent in table.index else None
+
+    def zscores(self, date, window, metric="Total"):
+        """Each agent's value on ``date`` against the active days of the ``window`` days before it."""
+        date = pd.Timestamp(date)
+        baseline = self.range_table(date - pd.Timedelta(days=window), date - pd.Timedelta(days=1), metric)
+        value = self.day_values(date, metric)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (value - baseline["Mean"]) / baseline["Std"]
+        return pd.DataFrame({
+            metric: value.astype(int),
+            "Baseline Days": baseline["Active Days"],
+            "Baseline Avg": baseline["Mean"],
+            "Baseline Std": baseline["Std"],
+            "Z-Score": z,
+        })
+
+    def day_values(self, date, metric="Total"):
+        """Each agent's value on ``date`` (0 where the agent has no row)."""
+        lo, hi = self._span(date, date)
+        m = METRICS.index(metric)
+        return pd.Series(self._sum[:, m, hi] - self._sum[:, m, lo], index=pd.Index(self.agents, name="Agent"))
+
+    def rolling_mean(self, agent, days, start_date, end_date, metric="Total"):
+        """Trailing ``days``-day calendar average for one agent, one value per day in range."""
+        lo, hi = self._span(start_date, end_date)
+        if agent not in self._pos or hi <= lo:
+            return pd.Series(dtype=float)
+        prefix = self._sum[self._pos[agent], METRICS.index(metric)]
+        ends = np.arange(lo + 1, hi + 1)
+        starts = np.maximum(ends - days, 0)
+        values = (prefix[ends] - prefix[starts]) / (ends - starts)
+        return pd.Series(values, index=pd.date_range(self.start + pd.Timedelta(days=lo), periods=hi - lo, name="Date"))
+
+
+@st.cache_resource
+def _shared(team):
+    return {"lock": threading.Lock(), "stats": RollingStats(), "version": None}
+
+
+@timed("process")
+def get_rolling_stats():
+    """The shared RollingStats for the current team's raw_agent_daily.
+
+    When the dataset reloads with its earlier rows unchanged, only the new
+    days are folded in; otherwise the statistics are rebuilt.
+    """
+    df = fetch_raw_agent_daily()
+    version = dataset_version("raw_agent_daily")
+    state = _shared(current_team())
+    with state["lock"]:
+        if state["version"] != version:
+            stats = state["stats"]
+            stats = stats.fork() if stats.matches(df) else RollingStats()
+            stats.extend(df)
+            state["stats"], state["version"] = stats, version
+        return state["stats"]
+
+
+@timed("process")
+def get_deviation_alerts(stats, date, window=28, threshold=ALERT_Z_THRESHOLD, metric="Total"):
+    """Agents active on ``date`` whose value is ``threshold`` or more std devs from their trailing window.
+
+    Agents with fewer than MIN_BASELINE_DAYS active days in the window are skipped.
+    """
+    scores = stats.zscores(date, window, metric)
+    flagged = (scores[metric] > 0) & (scores["Baseline Days"] >= MIN_BASELINE_DAYS) & (scores["Z-Score"].abs() >= threshold)
+    alerts = scores.loc[flagged, [metric, "Baseline Avg", "Baseline Std", "Z-Score"]].round(2)
+    alerts = alerts.rename(columns={"Baseline Avg": f"{window}d Avg", "Baseline Std": f"{window}d Std"})
+    alerts["Direction"] = np.where(alerts["Z-Score"] > 0, "Above", "Below")
+    return alerts.reindex(alerts["Z-Score"].abs().sort_values(ascending=False).index)
@@ -1,19 +1,65 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-import gspread
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 from datetime import datetime, timedelta
-from google.oauth2.service_account import Credentials
-from config.settings import SERVICE_ACCOUNT_FILE, ENGAGEMENT_SHEET_ID, ACCOUNTS_SHEET_ID, EXCLUDED_AGENTS
+from config.settings import (
+    SERVICE_ACCOUNT_FILE, TEAMS, DEFAULT_TEAM,
+    CACHE_TTL, SNAPSHOT_DIR, SNAPSHOT_POLL_SECONDS, DATA_BACKEND, SQL_DATASETS, DERIVED_TOTALS,
+    CHANGE_PROBES, PROBE_ROWS, PROBE_MAX_AGE,
+)
+from utils import derived, invalidation, metrics, perf, snapshot, sql_backend
+from utils.dataset_store import DatasetStore
+from utils.memory_budget import get_memory_budget
+from utils.teams import current_team, label
+
+logger = logging.getLogger("booster.sheets")
 
 
+@functools.lru_cache(maxsize=1)
 def _get_client():
+    # Imported here so pages served from the cache never pay for the Sheets client.
+    # Cached so loads and change probes share one authorized session.
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets.readonly",
+        "https://www.googleapis.com/auth/drive.metadata.readonly",  # modifiedTime for change probes
     ]
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=scopes)
     return gspread.authorize(creds)
 
 
+# Seconds spent waiting on the Sheets API during the current load, per thread.
+_network = threading.local()
+
+
+def _timed_network(call, *args):
+    started = time.perf_counter()
+    try:
+        return call(*args)
+    finally:
+        _network.seconds = getattr(_network, "seconds", 0.0) + time.perf_counter() - started
+
+
+def _open_sheet(sheet_id):
+    return _timed_network(lambda: _get_client().open_by_key(sheet_id))
+
+
+def _sheet_values(ws):
+    return _timed_network(ws.get_all_values)
+
+
 def _serial_to_date(value):
     """Convert Excel serial date number or date string to datetime."""
     if not value or not str(value).strip():
@@ -34,22 +80,18 @@ def _serial_to_date(value):
     return None
 
 
-@st.cache_data(ttl=300)
-def fetch_agent_list():
-    client = _get_client()
-    sheet = client.open_by_key(ENGAGEMENT_SHEET_ID)
-    ws = sheet.worksheet("_AgentList")
-    data = ws.get_all_values()
-    agents = [row[0] for row in data[1:] if row[0].strip() and row[0].strip() not in EXCLUDED_AGENTS]
+def _load_agent_list(team):
+    sheet = _open_sheet(team["engagement_sheet_id"])
+    ws = _timed_network(sheet.worksheet, "_AgentList")
+    data = _sheet_values(ws)
+    agents = [row[0] for row in data[1:] if row[0].strip() and row[0].strip() not in team["excluded_agents"]]
     return agents
 
 
-@st.cache_data(ttl=300)
-def fetch_raw_daily():
-    client = _get_client()
-    sheet = client.open_by_key(ENGAGEMENT_SHEET_ID)
-    ws = sheet.worksheet("_RawDaily")
-    data = ws.get_all_values()
+def _load_raw_daily(team):
+    sheet = _open_sheet(team["engagement_sheet_id"])
+    ws = _timed_network(sheet.worksheet, "_RawDaily")
+    data = _sheet_values(ws)
     if len(data) <= 1:
         return pd.DataFrame(columns=["Date", "Comments", "Reactions", "Shares", "Total"])
 
@@ -62,12 +104,10 @@ def fetch_raw_daily():
     return df
 
 
-@st.cache_data(ttl=300)
-def fetch_raw_agent_daily():
-    client = _get_client()
-    sheet = client.open_by_key(ENGAGEMENT_SHEET_ID)
-    ws = sheet.worksheet("_RawAgentDaily")
-    data = ws.get_all_values()
+def _load_raw_agent_daily(team):
+    sheet = _open_sheet(team["engagement_sheet_id"])
+    ws = _timed_network(sheet.worksheet, "_RawAgentDaily")
+    data = _sheet_values(ws)
     if len(data) <= 1:
         return pd.DataFrame(columns=["Date", "Agent", "Comments", "Reactions", "Shares", "Total"])
 
@@ -76,17 +116,15 @@ def fetch_raw_agent_daily():
     df = df.dropna(subset=["Date"])
     for col in ["Comments", "Reactions", "Shares", "Total"]:
         df[col] = pd.to_numeric(df[col].str.replace(",", ""), errors="coerce").fillna(0).astype(int)
-    df = df[~df["Agent"].isin(EXCLUDED_AGENTS)]
+    df = df[~df["Agent"].isin(team["excluded_agents"])]
     df = df.sort_values(["Date", "Agent"]).reset_index(drop=True)
     return df
 
 
-@st.cache_data(ttl=300)
-def fetch_task_daily():
-    client = _get_client()
-    sheet = client.open_by_key(ENGAGEMENT_SHEET_ID)
-    ws = sheet.worksheet("_RawTaskDaily")
-    data = ws.get_all_values()
+def _load_task_daily(team):
+    sheet = _open_sheet(team["engagement_sheet_id"])
+    ws = _timed_network(sheet.worksheet, "_RawTaskDaily")
+    data = _sheet_values(ws)
     if len(data) <= 1:
         return pd.DataFrame(columns=["Date", "Agent", "Task", "Comments", "Reactions", "Shares", "Total"])
 
@@ -95,17 +133,15 @@ def fetch_task_daily():
     df = df.dropna(subset=["Date"])
     for col in ["Comments", "Reactions", "Shares", "Total"]:
         df[col] = pd.to_numeric(df[col].str.replace(",", ""), errors="coerce").fillna(0).astype(int)
-    df = df[~df["Agent"].isin(EXCLUDED_AGENTS)]
+    df = df[~df["Agent"].isin(team["excluded_agents"])]
     df = df.sort_values(["Date", "Agent", "Task"]).reset_index(drop=True)
     return df
 
 
-@st.cache_data(ttl=300)
-def fetch_raw_monthly():
-    client = _get_client()
-    sheet = client.open_by_key(ENGAGEMENT_SHEET_ID)
-    ws = sheet.worksheet("_RawMonthly")
-    data = ws.get_all_values()
+def _load_raw_monthly(team):
+    sheet = _open_sheet(team["engagement_sheet_id"])
+    ws = _timed_network(sheet.worksheet, "_RawMonthly")
+    data = _sheet_values(ws)
     if len(data) <= 1:
         return pd.DataFrame(columns=["Month", "Comments", "Reactions", "Shares", "Total"])
 
@@ -115,17 +151,15 @@ def fetch_raw_monthly():
     return df
 
 
-@st.cache_data(ttl=300)
-def fetch_account_data():
+def _load_account_data(team):
     """Fetch account data from all agent sheets in the accounts spreadsheet.
     Blank usernames are excluded."""
-    client = _get_client()
-    sheet = client.open_by_key(ACCOUNTS_SHEET_ID)
+    sheet = _open_sheet(team["accounts_sheet_id"])
 
     all_accounts = []
-    for ws in sheet.worksheets():
+    for ws in _timed_network(sheet.worksheets):
         agent_name = ws.title
-        data = ws.get_all_values()
+        data = _sheet_values(ws)
         if len(data) <= 2:
             continue
 
@@ -165,6 +199,271 @@ def fetch_account_data():
 
     df = pd.DataFrame(all_accounts)
     if not df.empty:
-        df = df[~df["Agent"].isin(EXCLUDED_AGENTS)]
+        df = df[~df["Agent"].isin(team["excluded_agents"])]
         df["Created Date"] = pd.to_datetime(df["Created Date"], format="mixed", dayfirst=True, errors="coerce")
     return df
+
+
+# Tab behind each dataset; account_data reads every tab of the accounts spreadsheet.
+_DATASET_TABS = {name: tab for tab, name in invalidation.TAB_DATASETS.items()}
+
+# Cleared after the first Drive metadata refusal (API disabled or scope not granted).
+_drive_usable = threading.Event()
+_drive_usable.set()
+
+
+def _tail_token(sheet_id, tabs):
+    """Hash of column A and the last PROBE_ROWS rows of each tab (all tabs if ``tabs`` is None)."""
+    http = _get_client().http_client
+    if tabs is None:
+        meta = _timed_network(http.fetch_sheet_metadata, sheet_id, {"fields": "sheets.properties.title"})
+        tabs = [sheet["properties"]["title"] for sheet in meta["sheets"]]
+    columns = _timed_network(http.values_batch_get, sheet_id, [f"'{tab}'!A:A" for tab in tabs])
+    counts = [len(r.get("values", [])) for r in columns["valueRanges"]]
+    tails = _timed_network(http.values_batch_get, sheet_id, [
+        f"'{tab}'!{max(1, n - PROBE_ROWS + 1)}:{max(n, 1)}" for tab, n in zip(tabs, counts)
+    ])
+    payload = json.dumps([columns["valueRanges"], tails["valueRanges"]], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _change_token(team, name):
+    """Cheap token that differs whenever the tab(s) behind ``name`` may have changed.
+
+    Uses the spreadsheet's Drive modifiedTime (one small request, covering every
+    tab of it), falling back to _tail_token. Returns None when the probe fails,
+    which makes the store reload as usual.
+    """
+    sheet_id = team["accounts_sheet_id"] if name == "account_data" else team["engagement_sheet_id"]
+    try:
+        if _drive_usable.is_set():
+            try:
+                meta = _timed_network(_get_client().get_file_drive_metadata, sheet_id)
+                return "modified:" + meta["modifiedTime"]
+            except Exception as exc:
+                status = getattr(getattr(exc, "response", None), "status_code", None)
+                if status not in (403, 404):
+                    raise
+                _drive_usable.clear()
+                logger.warning("Drive metadata unavailable (%s); probing tab contents instead", status)
+        tabs = None if name == "account_data" else [_DATASET_TABS[name]]
+        return "tail:" + _tail_token(sheet_id, tabs)
+    except Exception as exc:
+        logger.warning("change probe for %s failed: %s", name, exc)
+        return None
+
+
+def _instrumented(name, loader):
+    """Record Sheets latency, parse time and API errors of one loader (``name`` is its metric label)."""
+    def load():
+        _network.seconds = 0.0
+        started = time.perf_counter()
+        try:
+            value = loader()
+        except Exception as exc:
+            # gspread's APIError (and requests' HTTPError) carry the HTTP response.
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+            if status is not None:
+                metrics.SHEETS_ERRORS.inc(dataset=name, status=status)
+            raise
+        finally:
+            network = _network.seconds
+            metrics.SHEETS_FETCH_SECONDS.observe(network, dataset=name)
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - started - network, dataset=name)
+        return value
+    return load
+
+
+def _derived_datasets():
+    return derived.DERIVED if DERIVED_TOTALS else {}
+
+
+def _live_loaders(team=DEFAULT_TEAM):
+    loaders = {
+        "agent_list": _load_agent_list,
+        "raw_daily": _load_raw_daily,
+        "raw_agent_daily": _load_raw_agent_daily,
+        "task_daily": _load_task_daily,
+        "raw_monthly": _load_raw_monthly,
+        "account_data": _load_account_data,
+    }
+    return {
+        name: _instrumented(label(team, name), functools.partial(loader, TEAMS[team]))
+        for name, loader in loaders.items() if name not in _derived_datasets()
+    }
+
+
+def load_live_datasets(*names, team=DEFAULT_TEAM):
+    """Fetch and parse one team's named datasets (all if none given), bypassing the store.
+
+    Derived datasets are built from their sources, which are fetched once.
+    """
+    loaders = _live_loaders(team)
+    rules = _derived_datasets()
+    values = {}
+
+    def load(name):
+        if name not in values:
+            if name in rules:
+                sources, build = rules[name]
+                values[name] = build(*(load(source) for source in sources))
+            else:
+                values[name] = loaders[name]()
+        return values[name]
+
+    return {name: load(name) for name in names or [*loaders, *rules]}
+
+
+def _snapshot_loader(name, live_loader):
+    def load():
+        version = snapshot.current_version()
+        if version is None:
+            # No snapshot written yet: serve live data until the worker catches up.
+            return live_loader()
+        return snapshot.read_dataset(name, version)
+    return load
+
+
+def _snapshot_token():
+    """Snapshot version; with no snapshot yet, a token that changes once per CACHE_TTL.
+
+    The live fallback of _snapshot_loader then reloads from Sheets at the
+    normal TTL rather than on every SNAPSHOT_POLL_SECONDS poll.
+    """
+    version = snapshot.current_version()
+    return version if version is not None else f"live-{int(time.time() // CACHE_TTL)}"
+
+
+def _sql_loader(name, loader):
+    def load():
+        return sql_backend.materialize(name, loader())
+    return load
+
+
+def _drift_checked(name, loader, agent_daily, team):
+    """Compare a downloaded rollup tab with the agent-level data after each load."""
+    def load():
+        value = loader()
+        derived.report_drift(name, value, agent_daily(), label=label(team, name))
+        return value
+    return load
+
+
+@st.cache_resource
+def _team_store(team):
+    loaders = _live_loaders(team)
+    # The snapshot worker writes the default team only; other teams always load live.
+    use_snapshot = SNAPSHOT_DIR and team == DEFAULT_TEAM
+    if use_snapshot:
+        loaders = {name: _snapshot_loader(name, loader) for name, loader in loaders.items()}
+    if DATA_BACKEND == "sqlite":
+        loaders.update({name: _sql_loader(f"{team}_{name}", loaders[name]) for name in SQL_DATASETS})
+    rules = _derived_datasets()
+    if not rules:
+        loaders.update({
+            name: _drift_checked(name, loaders[name], lambda: store.get("raw_agent_daily"), team)
+            for name in derived.DERIVED
+        })
+    budget = get_memory_budget().partition(team)
+    if not use_snapshot:
+        store = DatasetStore(
+            loaders,
+            ttl=CACHE_TTL,
+            probes={
+                name: functools.partial(_change_token, TEAMS[team], name) for name in loaders
+            } if CHANGE_PROBES else None,
+            derived=rules,
+            max_age=PROBE_MAX_AGE,
+            budget=budget,
+        )
+        invalidation.install(store, derived=rules, team=team)
+    else:
+        store = DatasetStore(
+            loaders,
+            ttl=SNAPSHOT_POLL_SECONDS,
+            probes={name: _snapshot_token for name in loaders},
+            derived=rules,
+            budget=budget,
+        )
+    metrics.CACHED_BYTES.set_callback(
+        f"dataset:{team}",
+        lambda: {("dataset", label(team, name)): size for name, size in store.memory_usage().items()},
+    )
+    return store
+
+
+def get_dataset_store(team=None):
+    """The shared store of ``team`` (the session's current team by default)."""
+    return _team_store(team or current_team())
+
+
+def clear_dataset_cache():
+    get_dataset_store().invalidate()
+
+
+def dataset_version(*names):
+    """Version tag of the current team's datasets; tags of different teams never match."""
+    team = current_team()
+    return f"{team}|{get_dataset_store(team).version(*names)}"
+
+
+def _fetch(name):
+    with perf.stage("fetch", f"fetch_{name}"):
+        value, hit = get_dataset_store().lookup(name)
+        perf.mark_cache(hit)
+        metrics.CACHE_REQUESTS.inc(cache="dataset", result="hit" if hit else "miss")
+    return value
+
+
+# Shared by all sessions; the store's per-dataset locks keep concurrent loads of one tab single.
+_fetch_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="booster-fetch")
+
+
+async def fetch_datasets_async(*names):
+    """Fetch several datasets concurrently; returns them in the order given.
+
+    Each fetch runs in a worker thread carrying the caller's Streamlit script
+    context and context variables, so caching and stage timing behave as if
+    the fetches had been called one after another.
+    """
+    loop = asyncio.get_running_loop()
+    script_ctx = get_script_run_ctx()
+
+    def fetch_in_worker(name):
+        if script_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), script_ctx)
+        return _fetch(name)
+
+    return await asyncio.gather(*(
+        loop.run_in_executor(_fetch_executor, contextvars.copy_context().run, fetch_in_worker, name)
+        for name in names
+    ))
+
+
+def fetch_datasets(*names):
+    """Blocking wrapper around fetch_datasets_async for page scripts."""
+    return asyncio.run(fetch_datasets_async(*names))
+
+
+def fetch_agent_list():
+    return _fetch("agent_list")
+
+
+def fetch_raw_daily():
+    return _fetch("raw_daily")
+
+
+def fetch_raw_agent_daily():
+    return _fetch("raw_agent_daily")
+
+
+def fetch_task_daily():
+    return _fetch("task_daily")
+
+
+def fetch_raw_monthly():
+    return _fetch("raw_monthly")
+
+
+def fetch_account_data():
+    return _fetch("account_data")
@@ -0,0 +1,70 @@
+"""Small HTTP server running next to the Streamlit app (metrics and admin routes)."""
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+from config.settings import METRICS_PORT
+from utils import metrics
+
+logger = logging.getLogger("booster.sidecar")
+
+_routes = {}
+
+
+def register_route(method, path, handler):
+    """handler(request) returns (status, content_type, body)."""
+    _routes[(method, path)] = handler
+
+
+def _metrics_route(request):
+    return 200, "text/plain; version=0.0.4; charset=utf-8", metrics.render()
+
+
+register_route("GET", "/metrics", _metrics_route)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _dispatch(self, method):
+        path = self.path.split("?", 1)[0]
+        handler = _routes.get((method, path))
+        if handler is None:
+            status, content_type, body = 404, "text/plain", "not found\n"
+        else:
+            try:
+                status, content_type, body = handler(self)
+            except Exception:
+                logger.exception("sidecar route %s %s failed", method, path)
+                status, content_type, body = 500, "text/plain", "error\n"
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the app log
+
+
+@st.cache_resource
+def ensure_started():
+    """Start the sidecar once per process; returns the server, or None when disabled."""
+    if not METRICS_PORT:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _Handler)
+    except OSError as exc:
+        # Another process on this host already serves the port.
+        logger.warning("sidecar not started on port %s: %s", METRICS_PORT, exc)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="booster-sidecar", daemon=True).start()
+    return server
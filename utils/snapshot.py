@@ -0,0 +1,108 @@
+"""Versioned Arrow IPC snapshots of the parsed datasets.
+
+One refresh worker (``python -m utils.snapshot``) writes every dataset under
+``SNAPSHOT_DIR/<version>/`` and swaps the ``CURRENT`` pointer atomically; each
+Streamlit process memory-maps the current version read-only.
+
+The worker is not in the default Procfile. To enable snapshots, set
+SNAPSHOT_DIR to a directory shared with the web processes and add::
+
+    worker: python -m utils.snapshot
+"""
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from config.settings import SNAPSHOT_DIR, SNAPSHOT_KEEP, SNAPSHOT_REFRESH_SECONDS
+
+_POINTER = "CURRENT"
+
+
+def current_version(directory=SNAPSHOT_DIR):
+    """Version named by the CURRENT pointer, or None if no snapshot exists."""
+    try:
+        with open(os.path.join(directory, _POINTER)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _to_table(value):
+    if isinstance(value, (list, tuple)):
+        value = pd.DataFrame({"Agent": list(value)})
+    return pa.Table.from_pandas(value, preserve_index=False).combine_chunks()
+
+
+def write_snapshot(datasets, directory=SNAPSHOT_DIR):
+    """Write all datasets as a new version and point CURRENT at it."""
+    version = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+    target = os.path.join(directory, version)
+    os.makedirs(target, exist_ok=True)
+    for name, value in datasets.items():
+        table = _to_table(value)
+        with pa.OSFile(os.path.join(target, f"{name}.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    tmp = os.path.join(directory, f".{_POINTER}.{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(directory, _POINTER))
+    _prune(directory, keep=SNAPSHOT_KEEP)
+    return version
+
+
+def _prune(directory, keep):
+    versions = sorted(
+        d for d in os.listdir(directory)
+        if not d.startswith(".") and os.path.isdir(os.path.join(directory, d))
+    )
+    for old in versions[:-keep]:
+        # Readers that still map an old version keep it alive on POSIX;
+        # on Windows the delete fails until they let go, so retry next time.
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+
+def _column(col):
+    if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+        return pd.arrays.ArrowStringArray(col)
+    if col.null_count == 0 and col.num_chunks == 1 and (
+        pa.types.is_integer(col.type) or pa.types.is_floating(col.type) or pa.types.is_timestamp(col.type)
+    ):
+        # Numpy view straight over the mapped buffer: no copy, read-only.
+        return col.chunk(0).to_numpy(zero_copy_only=True)
+    return col.to_pandas()
+
+
+def read_dataset(name, version, directory=SNAPSHOT_DIR):
+    """Memory-map one dataset from a snapshot version as a DataFrame."""
+    source = pa.memory_map(os.path.join(directory, version, f"{name}.arrow"), "r")
+    table = pa.ipc.open_file(source).read_all()
+    frame = pd.DataFrame({c: _column(table.column(c)) for c in table.column_names}, copy=False)
+    if name == "agent_list":
+        return frame["Agent"].tolist()
+    return frame
+
+
+def run_worker(interval=SNAPSHOT_REFRESH_SECONDS):
+    from utils.sheets_connector import load_live_datasets
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    while True:
+        started = time.time()
+        try:
+            version = write_snapshot(load_live_datasets())
+            print(f"snapshot {version} written in {time.time() - started:.1f}s", flush=True)
+        except Exception as exc:
+            print(f"snapshot refresh failed: {exc!r}", file=sys.stderr, flush=True)
+        time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    if not SNAPSHOT_DIR:
+        sys.exit("Set SNAPSHOT_DIR to the directory the dashboard processes read from.")
+    run_worker()
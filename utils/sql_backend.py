@@ -0,0 +1,132 @@
+"""Datasets held in an embedded SQLite file instead of in-memory frames.
+
+With DATA_BACKEND=sqlite, the datasets in SQL_DATASETS are written to SQLite
+once per load and the store keeps only a ``SqlDataset`` handle. The
+data_processor functions recognise the handle and run date, agent and task
+filters plus the grouping as SQL, so only result rows reach pandas.
+"""
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+from config.settings import SQL_DB_PATH
+
+_DATE_FORMAT = "%Y-%m-%d"
+_KEEP_TABLES = 2  # the current table plus the one in-flight reruns may still read
+
+_generation = itertools.count(1)
+_write_lock = threading.Lock()
+_tables = {}  # (path, dataset name) -> tables this process wrote for it, oldest first
+
+
+def _db_path():
+    return SQL_DB_PATH or os.path.join(tempfile.gettempdir(), f"booster-{os.getpid()}.sqlite")
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _date_param(value):
+    return pd.Timestamp(value).strftime(_DATE_FORMAT)
+
+
+class SqlDataset:
+    """Read-only handle on one loaded dataset table."""
+
+    def __init__(self, path, table, columns, rows):
+        self.path = path
+        self.table = table
+        self.columns = list(columns)
+        self.rows = rows
+
+    @property
+    def empty(self):
+        return self.rows == 0
+
+    def __len__(self):
+        return self.rows
+
+    def _where(self, start_date=None, end_date=None, **equals):
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append('"Date" >= ?')
+            params.append(_date_param(start_date))
+        if end_date is not None:
+            clauses.append('"Date" <= ?')
+            params.append(_date_param(end_date))
+        for column, value in equals.items():
+            if value is not None:
+                clauses.append(f"{_quote(column)} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, sql, params=()):
+        """Run ``sql`` (``{table}`` names this dataset) and return the rows as a DataFrame."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            df = pd.read_sql_query(sql.format(table=_quote(self.table)), conn, params=params)
+        if "Date" in df.columns:
+            df["Date"] = pd.to_datetime(df["Date"], format=_DATE_FORMAT)
+        return df
+
+    def select(self, start_date=None, end_date=None, **equals):
+        where, params = self._where(start_date, end_date, **equals)
+        return self.query(f"SELECT * FROM {{table}}{where} ORDER BY rowid", params)
+
+    def iter_select(self, chunk_rows, start_date=None, end_date=None, **equals):
+        """Like select(), but yields the rows ``chunk_rows`` at a time from one open cursor."""
+        where, params = self._where(start_date, end_date, **equals)
+        sql = f"SELECT * FROM {_quote(self.table)}{where} ORDER BY rowid"
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            for df in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_rows):
+                if "Date" in df.columns:
+                    df["Date"] = pd.to_datetime(df["Date"], format=_DATE_FORMAT)
+                yield df
+
+    def sum_by(self, keys, columns, start_date=None, end_date=None, **equals):
+        """SUM(columns) GROUP BY keys over the filtered rows, ordered by keys like pandas."""
+        where, params = self._where(start_date, end_date, **equals)
+        key_sql = ", ".join(_quote(k) for k in keys)
+        sums = ", ".join(f"SUM({_quote(c)}) AS {_quote(c)}" for c in columns)
+        return self.query(f"SELECT {key_sql}, {sums} FROM {{table}}{where} GROUP BY {key_sql} ORDER BY {key_sql}", params)
+
+    def count_distinct(self, column, start_date=None, end_date=None, **equals):
+        where, params = self._where(start_date, end_date, **equals)
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            sql = f"SELECT COUNT(DISTINCT {_quote(column)}) FROM {_quote(self.table)}{where}"
+            return conn.execute(sql, params).fetchone()[0]
+
+    def distinct(self, column):
+        """Sorted non-null values of ``column``."""
+        sql = f"SELECT DISTINCT {_quote(column)} FROM {{table}} WHERE {_quote(column)} IS NOT NULL ORDER BY 1"
+        return self.query(sql)[column].tolist()
+
+
+def materialize(name, frame, path=None):
+    """Write a loaded frame to a new table and return its handle.
+
+    Dates are stored as ISO text, so range predicates compare lexically and
+    use the Date index; tables older than the previous load are dropped.
+    """
+    path = path or _db_path()
+    table = f"{name}_{os.getpid()}_{next(_generation)}"
+    stored = frame.assign(Date=frame["Date"].dt.strftime(_DATE_FORMAT)) if "Date" in frame.columns else frame
+    with _write_lock, closing(sqlite3.connect(path, timeout=30)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        stored.to_sql(table, conn, index=False)
+        if "Date" in frame.columns:
+            conn.execute(f'CREATE INDEX {_quote(table + "_date")} ON {_quote(table)} ("Date")')
+        if "Agent" in frame.columns:
+            conn.execute(f'CREATE INDEX {_quote(table + "_agent")} ON {_quote(table)} ("Agent", "Date")')
+        written = _tables.setdefault((path, name), [])
+        written.append(table)
+        for old in written[:-_KEEP_TABLES]:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(old)}")
+        del written[:-_KEEP_TABLES]
+        conn.commit()
+    return SqlDataset(path, table, frame.columns, len(frame))
@@ -0,0 +1,24 @@
+import pandas as pd
+import streamlit as st
+
+# Columns holding percentages already scaled to 0-100
+PERCENT_COLUMNS = {"% Contribution", "% of Day", "% of Total", "Active %"}
+
+
+def table_column_config(df):
+    """Display formats for a frame's numeric columns; the values stay numeric."""
+    config = {}
+    for col in df.columns:
+        if col in PERCENT_COLUMNS:
+            config[col] = st.column_config.NumberColumn(col, format="%.1f%%")
+        elif pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            config[col] = st.column_config.NumberColumn(col, format="localized")
+    return config
+
+
+def render_table(df, height=None, hide_index=False, column_config=None):
+    """st.dataframe with typed numeric columns formatted by the browser, so they still sort numerically."""
+    config = table_column_config(df)
+    config.update(column_config or {})
+    kwargs = {"height": height} if height else {}
+    st.dataframe(df, use_container_width=True, hide_index=hide_index, column_config=config, **kwargs)
@@ -0,0 +1,37 @@
+"""Team selection for deployments that serve several teams (TEAMS in config/settings.py)."""
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config.settings import DEFAULT_TEAM, TEAMS
+
+
+def current_team():
+    """Team of the running session: its sidebar choice, else ?team=, else DEFAULT_TEAM."""
+    if get_script_run_ctx() is None:
+        return DEFAULT_TEAM
+    team = st.session_state.get("_team")
+    if team in TEAMS:
+        return team
+    requested = st.query_params.get("team")
+    return requested if requested in TEAMS else DEFAULT_TEAM
+
+
+def select_team():
+    """Sidebar team picker, shown only when more than one team is configured.
+
+    Call it before the page fetches any data; returns the selected team id.
+    """
+    team = current_team()
+    if len(TEAMS) > 1:
+        names = list(TEAMS)
+        team = st.sidebar.selectbox(
+            "Team", names, index=names.index(team), format_func=lambda t: TEAMS[t]["name"], key="_team_select",
+        )
+        st.session_state["_team"] = team
+        st.query_params["team"] = team
+    return team
+
+
+def label(team, name):
+    """Metric label for one team's dataset; the default team keeps the bare name."""
+    return name if team == DEFAULT_TEAM else f"{team}/{name}"